@@ -0,0 +1,251 @@
+import argparse
+import http.client
+import json
+import math
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+from cache import ResultCache
+from gamedata import get_game_data
+from jobs import JobManager, JobQueueFull
+from layouts import validate_config
+from pipeline import MAX_RESTARTS, clean
+from roster import Roster
+from store import STORE_PATH, ResultStore
+
+# ==========================================
+# 本地 HTTP JSON 接口
+# ==========================================
+# 供 MAA 自动化主机在无浏览器的情况下获取排班：
+#   POST /schedule  {"operators": [...MAA 干员导出...], "config": {...current_config...},
+#                    "restarts": 1, "wait": 60}      (restarts 取 1-8，wait 取 0-300 秒)
+#       -> 200 {"curr", "pot", "suggestions", "total_efficiency", ...}
+#       -> 202 {"job_id"}  在 wait 秒内未完成时返回，之后轮询 GET /jobs/<job_id>
+#   GET  /jobs/<job_id>   任务状态 / 结果
+#   GET  /healthz         存活检查
+# 请求体不是有效 JSON、Content-Length 无效、干员或 config 格式不符、restarts / wait 不是有限数字时返回 400。
+# 计算交给与界面相同的 JobManager：任务线程数与排队深度有上限 (满时返回 503)，
+# 相同干员表 + 配置的进行中请求共用同一次计算。连接使用 HTTP/1.1 keep-alive。
+#
+# 用法示例:
+#   python api.py --port 8600
+#   curl -s localhost:8600/schedule -d @request.json
+
+MAX_BODY = 8 * 1024 * 1024  # 请求体上限 (字节)
+DEFAULT_WAIT = 60.0  # POST /schedule 默认同步等待的秒数
+MAX_WAIT = 300.0  # 同步等待的上限 (秒)，更久的任务改为轮询
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def job_payload(job, manager):
+    # 任务 -> 响应体；方案本体从任务队列的结果存储中按句柄取出，并去掉不可序列化的原始结果对象
+    body = {"job_id": job.id, "state": job.state, "phase": job.phase, "percent": job.percent}
+    plans = manager.plans(job) if job.state == "done" else None
+    if job.state == "done" and plans is None:
+        body.update({"state": "error", "error": "结果已过期，请重新提交"})
+    elif job.state == "done":
+        result = job.result
+        body.update({
+            "key": result["key"],
+            "curr": clean(plans["curr"]),
+            "pot": clean(plans["pot"]) if plans["pot"] is not None else None,
+            "suggestions": plans["txt"],
+            "total_efficiency": result["eff"],
+            "bound": result["bound"],
+            "partial": result["partial"],
+            "cached": result["cached"],
+            "elapsed": result["elapsed"],
+        })
+    elif job.state == "error":
+        body["error"] = job.error
+    return body
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, manager=None):
+        super().__init__(address, _Handler)
+        if manager is None:
+            manager = JobManager(cache=ResultCache(maxsize=128, ttl=6 * 3600),
+                                 store=ResultStore() if STORE_PATH else None)
+        self.manager = manager
+        self.game_data = get_game_data()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive：同一连接可连续发送多个请求
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/healthz":
+            self._send(200, {"ok": True, "jobs": self.server.manager.stats()})
+        elif path.startswith("/jobs/"):
+            job = self.server.manager.get(path[len("/jobs/"):])
+            if job is None:
+                self._send(404, {"error": "任务不存在或已过期"})
+            else:
+                body = job_payload(job, self.server.manager)
+                self._send(202 if not job.finished else 500 if body["state"] == "error" else 200, body)
+        else:
+            self._send(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        try:
+            if self.path.split("?")[0] != "/schedule":
+                self._discard_body()
+                raise ApiError(404, "未知路径")
+            request = self._read_json()
+            roster, config, restarts, wait = self._parse_request(request)
+            manager = self.server.manager
+            job_id = manager.submit(roster, config, self.server.game_data, restarts=restarts)
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+            return
+        except JobQueueFull as e:
+            self._send(503, {"error": str(e)}, {"Retry-After": "5"})
+            return
+
+        job = manager.get(job_id)
+        job.wait(wait)
+        body = job_payload(job, manager)
+        if not job.finished:
+            self._send(202, body, {"Location": f"/jobs/{job.id}"})
+        elif body["state"] == "error":
+            self._send(500, body)
+        else:
+            self._send(200, body)
+
+    def _content_length(self):
+        # 非数字或负数的 Content-Length 无法确定请求体边界：返回 400 并关闭连接
+        value = self.headers.get("Content-Length") or "0"
+        try:
+            length = int(value)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise ApiError(400, f"Content-Length 无效: {value}")
+        return length
+
+    def _read_json(self):
+        length = self._content_length()
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise ApiError(413, f"请求体超过上限 ({MAX_BODY} 字节)")
+        try:
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ApiError(400, f"请求体不是有效的 JSON: {e}")
+        if not isinstance(request, dict):
+            raise ApiError(400, "请求体应为 JSON 对象")
+        return request
+
+    def _parse_request(self, request):
+        operators = request.get("operators")
+        config = request.get("config")
+        if not isinstance(operators, list) or not operators:
+            raise ApiError(400, "operators 应为非空的 MAA 干员导出数组")
+        try:
+            validate_config(config)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        try:
+            roster = Roster.from_list(operators)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ApiError(400, f"干员条目格式无效: {e}")
+        try:
+            restarts = float(request.get("restarts", 1))
+            wait = float(request.get("wait", DEFAULT_WAIT))
+        except (TypeError, ValueError, OverflowError):
+            raise ApiError(400, "restarts / wait 应为数字")
+        if not (math.isfinite(restarts) and math.isfinite(wait)):
+            raise ApiError(400, "restarts / wait 应为有限的数字")
+        # 与界面滑块一致限制重启次数；同步等待超过上限时按上限返回 202，之后轮询
+        restarts = min(max(1, int(restarts)), MAX_RESTARTS)
+        wait = min(max(0.0, wait), MAX_WAIT)
+        return roster, config, restarts, wait
+
+    def _discard_body(self):
+        length = self._content_length()
+        if 0 < length <= MAX_BODY:
+            self.rfile.read(length)
+        elif length:
+            self.close_connection = True
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        metrics.logger.debug(format, *args)
+
+
+def start_api_server(port=8600, host="127.0.0.1", manager=None):
+    # 在后台线程启动接口服务 (测试或嵌入其他进程时使用)，返回 ApiServer
+    server = ApiServer((host, port), manager)
+    threading.Thread(target=server.serve_forever, name="maa-api", daemon=True).start()
+    return server
+
+
+# ==========================================
+# 客户端
+# ==========================================
+
+class Client:
+    # 复用同一个 keep-alive 连接的简易客户端；一个实例只在一个线程中使用
+
+    def __init__(self, host="127.0.0.1", port=8600, timeout=300):
+        self._conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        self._conn.request(method, path, body=data, headers=headers)
+        response = self._conn.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+
+    def schedule(self, operators, config, restarts=1, wait=DEFAULT_WAIT):
+        return self.request("POST", "/schedule", {"operators": operators, "config": config,
+                                                  "restarts": restarts, "wait": wait})
+
+    def job(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="排班 HTTP JSON 接口")
+    parser.add_argument("--port", type=int, default=8600, help="监听端口")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    args = parser.parse_args(argv)
+
+    server = ApiServer((args.host, args.port))
+    print(f"排班接口已启动: http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
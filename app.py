@@ -1,9 +1,8 @@
 import streamlit as st
 import json
-import os
 import datetime
+import functools
 import pytz
-import time
 
 # ==========================================
 # 版本控制与导入
@@ -12,17 +11,25 @@ APP_VERSION = "1.4.7"  # App 前端版本
 
 # 尝试从 logic 导入版本号，如果不存在则使用默认值
 try:
-    from logic import WorkplaceOptimizer
     from logic import VERSION as LOGIC_VERSION
 except ImportError:
     # 如果 logic.py 中没有定义 VERSION 变量
-    from logic import WorkplaceOptimizer
-
     LOGIC_VERSION = "1.0.0"
 except Exception:
     # 处理其他可能的导入错误
     LOGIC_VERSION = "Unknown"
 
+from pipeline import MAX_RESTARTS, RESTARTS, clean
+from roster import Roster
+from cache import ResultCache
+from store import STORE_PATH, ResultStore
+from jobs import JobManager, JobQueueFull
+from layouts import LAYOUT_PRESETS, build_config
+from whatif import max_elite, promotion_candidates
+from simulate import compare_rotations, compile_plan, simulate
+import metrics
+from gamedata import get_game_data
+
 # ==========================================
 # 0. 全局配置与样式优化
 # ==========================================
@@ -82,11 +89,161 @@ def get_timestamp():
     return beijing_time.strftime('%Y-%m-%d %H:%M:%S')
 
 
+@st.cache_resource
+def get_result_cache():
+    # 进程级共享：所有会话共用同一个结果缓存
+    return ResultCache(maxsize=128, ttl=6 * 3600)
+
+
+@st.cache_resource
+def get_disk_store():
+    # 持久化结果存储 (SQLite)：服务重启后仍可命中；MAA_STORE_PATH 设为空时不启用
+    return ResultStore() if STORE_PATH else None
+
+
+@st.cache_resource
+def get_result_store():
+    # 进程级共享的结果存储：会话中只保存结果句柄 (内容哈希)，方案本体按句柄存放在这里
+    return ResultCache(maxsize=256, ttl=24 * 3600)
+
+
+def result_payload(manager, handle, part, roster, config, game_data, restarts=1):
+    # 下载时才序列化；结果已被淘汰时按原干员表与配置重新提交到后台任务队列 (受并发数与排队上限约束，
+    # 通常直接命中方案缓存) 并等待完成。
+    # 由 st.download_button 在独立线程中调用，因此依赖项都以参数传入，不访问 Session State。
+    entry = manager.results.get(handle)
+    if entry is None:
+        job = manager.get(manager.submit(roster, config, game_data, restarts=restarts))
+        job.wait()
+        if job.state == "error":
+            raise RuntimeError(job.error)
+        entry = manager.plans(job)
+    if part == "txt":
+        return entry["txt"]
+    return json.dumps(clean(entry[part]), ensure_ascii=False, indent=2)
+
+
+@st.cache_resource
+def get_job_manager():
+    # 进程级共享的后台任务队列 (并发数/队列深度见 jobs.py 环境变量)
+    return JobManager(cache=get_result_cache(), store=get_disk_store(), results=get_result_store())
+
+
+@st.cache_resource
+def get_metrics_server():
+    # 设置 MAA_METRICS_PORT 时在本机暴露 Prometheus 指标端点 (/metrics)
+    return metrics.start_metrics_server()
+
+
+def finish_job(job):
+    # 任务结束：把结果写入 Session State，并记录一次性的状态提示
+    if job.state == "done" and job.kind == "sweep":
+        result = job.result
+        st.session_state.sweep = result
+        note = "" if result["complete"] else "，已达时间预算，仅部分完成"
+        st.session_state.job_notice = {
+            "label": f"✅ 全布局扫描完成：评估 {result['evaluated']}/{result['total']} 种 "
+                     f"(耗时 {result['elapsed']:.2f}s{note})",
+            "state": "complete"}
+    elif job.state == "done" and job.kind == "whatif":
+        st.session_state.whatif = job.result
+        st.session_state.job_notice = {"label": "✅ 练度模拟完成", "state": "complete"}
+    elif job.state == "done" and job.kind == "promote":
+        result = job.result
+        st.session_state.promotions = result
+        st.session_state.job_notice = {
+            "label": f"✅ 精英化收益评估完成：{result['evaluated']}/{result['total']} 名干员 "
+                     f"(耗时 {result['elapsed']:.2f}s)",
+            "state": "complete"}
+    elif job.state == "done":
+        result = job.result
+        # 下载重算与练度模拟都以本次计算的干员表与配置为基准
+        st.session_state.baseline = st.session_state.job_inputs
+        st.session_state.promotions = None
+        st.session_state.whatif = None
+        # 方案本体已由任务队列放入共享结果存储，会话中只保留句柄与少量指标
+        st.session_state.results = {
+            "key": result["key"],
+            "eff": result["eff"],
+            "bound": result["bound"],
+            "gap": result["gap"],
+            "partial": result["partial"],
+            "spread": result["spread"],
+            "restarts": st.session_state.job_restarts,
+            "shifts": result["shifts"],
+            # 调试面板使用：本次各阶段耗时与计数
+            "debug": {"timings": dict(result["timings"], parse=st.session_state.get("parse_seconds", 0.0)),
+                      "counters": result["counters"], "elapsed": result["elapsed"]}
+        }
+        st.session_state.calculated = True
+        if result["counters"]["reused"]:
+            done_label = (f"✅ {result['counters']['roster_changes']} 名干员的移除或练度下降不影响现有排班，"
+                          "已直接沿用上一次的方案")
+        elif result["rescored"]:
+            done_label = "✅ 已复用现有排班，仅重新套用无人机/菲亚梅塔设置"
+        elif result["counters"]["store_hits"]:
+            done_label = "✅ 命中持久化存储！方案已生成"
+        elif result["cached"]:
+            done_label = "✅ 命中缓存！方案已生成"
+        else:
+            done_label = "✅ 神经模拟完成！方案已生成"
+        if result["partial"]:
+            done_label = "✅ 已在时间预算内生成当前方案 (理论极限方案仍在后台计算)"
+        pruned = result["counters"]["pruned"]
+        pruned_note = f"，已剪除 {pruned} 名无效候选" if pruned else ""
+        st.session_state.job_notice = {"label": f"{done_label} (耗时 {result['elapsed']:.2f}s{pruned_note})",
+                                       "state": "complete"}
+    else:
+        st.session_state.job_notice = {"label": "❌ 计算过程中断", "state": "error",
+                                       "error": job.error, "traceback": job.traceback}
+    st.session_state.job_id = None
+
+
+@st.fragment(run_every=1)
+def job_status_panel():
+    # 轮询后台任务状态；完成后触发整页 rerun 渲染结果
+    job = get_job_manager().get(st.session_state.job_id)
+    if job is None:
+        # 任务已过期被清理
+        st.session_state.job_id = None
+        st.rerun()
+    if not job.finished:
+        with st.status(job.label, expanded=True):
+            st.progress(job.percent)
+            best = job.best
+            if best is not None:
+                # 计算过程中的当前最优结果，随搜索推进实时刷新
+                bound = f"，参考上界 {best['bound']:.2f}%" if best.get("bound") is not None else ""
+                where = f" ({best['label']})" if best.get("label") else ""
+                st.caption(f"🏁 当前最优首班总效率 {best['efficiency']:.2f}%{where}{bound}")
+            for line in job.log:
+                st.write(line)
+        return
+    finish_job(job)
+    st.rerun()
+
+
+get_metrics_server()
+
 # 状态初始化
 if 'calculated' not in st.session_state:
     st.session_state.calculated = False
 if 'results' not in st.session_state:
     st.session_state.results = {}
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+if 'job_notice' not in st.session_state:
+    st.session_state.job_notice = None
+if 'job_inputs' not in st.session_state:
+    st.session_state.job_inputs = None
+if 'baseline' not in st.session_state:
+    st.session_state.baseline = None
+if 'whatif' not in st.session_state:
+    st.session_state.whatif = None
+if 'promotions' not in st.session_state:
+    st.session_state.promotions = None
+if 'sweep' not in st.session_state:
+    st.session_state.sweep = None
 
 # ==========================================
 # 1. 侧边栏：数据源 (Source of Truth)
@@ -116,7 +273,8 @@ with st.sidebar:
     st.markdown("---")
 
     st.subheader("📂 数据导入")
-    base_efficiency_path = "internal"
+    # 基础效率数据的路径与版本戳：进程内只生成一次，所有会话共享
+    game_data = get_game_data("internal")
 
     # 使用 Tab 切换导入方式，更简洁
     import_tab1, import_tab2 = st.tabs(["📋 剪贴板 (推荐)", "📁 文件上传"])
@@ -127,45 +285,72 @@ with st.sidebar:
         # ========================================================
 
         # 1. 确保永久存储变量存在 (这个变量不绑定到具体组件，所以不会被自动清除)
+        #    pasted_json_data: 尚未解析的原文；pasted_roster: 解析后的紧凑干员表
         if "pasted_json_data" not in st.session_state:
             st.session_state.pasted_json_data = ""
+        if "pasted_roster" not in st.session_state:
+            st.session_state.pasted_roster = None
+            st.session_state.pasted_error = None
 
 
-        # 2. 定义回调函数：当输入框内容变化时，立刻同步到永久变量
+        # 2. 只在导入时解析一次：成功后只保留 Roster (含哈希与截断预览)，丢弃原文
+        def ingest_pasted_text():
+            raw = st.session_state.pasted_json_data
+            if not raw.strip():
+                return
+            try:
+                with metrics.timer("parse") as parse_timer:
+                    st.session_state.pasted_roster = Roster.parse(raw)
+                st.session_state.parse_seconds = parse_timer.seconds
+                st.session_state.pasted_json_data = ""
+                st.session_state.pasted_error = None
+            except ValueError as e:
+                st.session_state.pasted_roster = None
+                st.session_state.pasted_error = str(e)
+
+
+        # 3. 定义回调函数：当输入框内容变化时，立刻同步到永久变量并解析
         def sync_input_to_store():
             # 将 临时组件(_widget_input) 的值 复制给 永久变量(pasted_json_data)
             st.session_state.pasted_json_data = st.session_state._widget_input
+            ingest_pasted_text()
 
 
-        # 3. 定义清除函数
+        # 4. 定义清除函数
         def clear_paste():
             st.session_state.pasted_json_data = ""
+            st.session_state.pasted_roster = None
+            st.session_state.pasted_error = None
 
 
-        # 4. 判断逻辑：检查永久变量里有没有数据
-        current_data = st.session_state.pasted_json_data
-        has_data = len(current_data.strip()) > 0
+        # 原文由其他途径写入 (未经过回调) 时补做一次解析
+        if st.session_state.pasted_json_data.strip() and st.session_state.pasted_roster is None \
+                and st.session_state.pasted_error is None:
+            ingest_pasted_text()
 
-        if has_data:
-            # === 状态 A: 已有数据 (组件被隐藏，但数据在 pasted_json_data 中安全存储) ===
-            import json
+        # 5. 判断逻辑：检查永久变量里有没有数据
+        pasted_roster = st.session_state.pasted_roster
+        has_data = pasted_roster is not None or len(st.session_state.pasted_json_data.strip()) > 0
 
-            try:
-                data_preview = json.loads(current_data)
-                count_info = f"包含 {len(data_preview)} 名干员" if isinstance(data_preview, list) else "格式有效"
-            except:
-                count_info = "文本已导入 (未解析)"
-
-            st.success(f"✅ JSON 已就绪\n\n{count_info}")
+        if has_data:
+            # === 状态 A: 已有数据 (组件被隐藏，但数据在 Session State 中安全存储) ===
+            if pasted_roster is not None:
+                st.success(f"✅ JSON 已就绪\n\n包含 {len(pasted_roster)} 名干员"
+                           f"{f' (剔除 {pasted_roster.pruned} 名未拥有/重复)' if pasted_roster.pruned else ''}")
+            else:
+                st.warning(f"文本已导入 (未解析)\n\n{st.session_state.pasted_error}")
 
             # 清除按钮
             st.button("🗑️ 清除重置", on_click=clear_paste, key="btn_clear_json", use_container_width=True)
 
-            with st.expander("🔍 查看原始数据"):
-                st.code(current_data, language="json")
-
-            # 赋值给下游变量
-            pasted_ops = current_data
+            if pasted_roster is not None:
+                with st.expander("🔍 查看原始数据"):
+                    # 按需渲染，且只展示截断后的预览
+                    if st.toggle("显示原始数据预览", key="show_raw_preview"):
+                        truncated = pasted_roster.raw_size > len(pasted_roster.preview)
+                        st.code(pasted_roster.preview + ("\n..." if truncated else ""), language="json")
+                        if truncated:
+                            st.caption(f"仅显示前 {len(pasted_roster.preview)} / {pasted_roster.raw_size} 个字符")
 
         else:
             # === 状态 B: 等待输入 ===
@@ -183,12 +368,29 @@ with st.sidebar:
                 on_change=sync_input_to_store  # <--- 关键：变动时同步
             )
 
-            # 此时还没数据
-            pasted_ops = ""
-
     with import_tab2:
         uploaded_ops = st.file_uploader("上传 operators.json", type="json")
 
+        # 同一个文件只解析一次 (以上传文件 ID 判断)
+        uploaded_roster = None
+        if uploaded_ops is not None:
+            if st.session_state.get("uploaded_file_id") != uploaded_ops.file_id:
+                try:
+                    with metrics.timer("parse") as parse_timer:
+                        st.session_state.uploaded_roster = Roster.parse(uploaded_ops.getvalue())
+                    st.session_state.parse_seconds = parse_timer.seconds
+                    st.session_state.uploaded_error = None
+                except (ValueError, UnicodeDecodeError) as e:
+                    st.session_state.uploaded_roster = None
+                    st.session_state.uploaded_error = str(e)
+                st.session_state.uploaded_file_id = uploaded_ops.file_id
+            uploaded_roster = st.session_state.uploaded_roster
+            if uploaded_roster is not None:
+                st.caption(f"✅ 包含 {len(uploaded_roster)} 名干员"
+                           f"{f' (剔除 {uploaded_roster.pruned} 名未拥有/重复)' if uploaded_roster.pruned else ''}")
+            else:
+                st.error(f"文件解析失败：{st.session_state.uploaded_error}", icon="🚫")
+
     st.markdown("---")
     st.caption(f"Author: 一只摆烂的42")
 
@@ -221,45 +423,16 @@ with st.container(border=True):
         )
 
     with l_col2:
-        # 初始化产物默认值变量
-        p_lmd, p_gold, p_rec, p_shard = 0, 0, 0, 0
-
-        # --- 核心修改逻辑：根据预设定义建筑数量 & 产物分配默认值 ---
-        if layout_preset == "3-3-3 (搓玉推荐)":
-            # 3贸易 3制造 -> 2赤金 0经验 1碎片 | 2龙门币 1合成玉
-            def_t, def_m = 3, 3
-            p_lmd = 2  # 贸易站默认分配给龙门币的数量 (剩余给合成玉)
-            p_gold = 2  # 制造站：赤金
-            p_rec = 0  # 制造站：经验
-            p_shard = 1  # 制造站：碎片
-            disabled = True
-
-        elif layout_preset == "2-4-3 (均衡)":
-            # 2贸易 4制造 -> 2赤金 2经验 | 全龙门币
-            def_t, def_m = 2, 4
-            p_lmd = 2
-            p_gold = 2
-            p_rec = 2
-            p_shard = 0
-            disabled = True
-
-        elif layout_preset == "1-5-3 (极限制造)":
-            # 1贸易 5制造 -> 2赤金 3经验 | 全龙门币
-            def_t, def_m = 1, 5
-            p_lmd = 1
-            p_gold = 2
-            p_rec = 3
-            p_shard = 0
-            disabled = True
-
-        else:  # 自定义
-            def_t, def_m = 2, 4
-            disabled = False
-            # 自定义模式下，默认值设为当前输入框可能的合理值，后续由用户调整
-            p_lmd = 2
-            p_gold = 2
-            p_rec = 2
-            p_shard = 0
+        # --- 核心修改逻辑：根据预设定义建筑数量 & 产物分配默认值 (定义见 layouts.py) ---
+        preset = LAYOUT_PRESETS.get(layout_preset.split(" ")[0])
+        disabled = preset is not None
+        if preset is None:  # 自定义
+            # 自定义模式下，默认值设为当前输入框可能的合理值 (同 2-4-3)，后续由用户调整
+            preset = LAYOUT_PRESETS["2-4-3"]
+
+        def_t, def_m = preset["trading"], preset["manufacture"]
+        p_lmd = preset["lmd"]  # 贸易站默认分配给龙门币的数量 (剩余给合成玉)
+        p_gold, p_rec, p_shard = preset["gold"], preset["record"], preset["shard"]
 
         c1, c2 = st.columns(2)
         # 注意：这里仅仅是布局数量
@@ -415,6 +588,11 @@ with st.expander("⚙️ 高级设置 (菲亚梅塔 / 无人机)", expanded=Fals
 
         drone_order = "pre"
 
+    st.markdown("##### 🔬 搜索强度")
+    restarts = st.slider("重复搜索次数", 1, MAX_RESTARTS, min(RESTARTS, MAX_RESTARTS),
+                         help="以不同随机种子重复搜索并取最优；次数越多结果越稳定，耗时也越长。"
+                              "若搜索结果与种子无关，两次后即提前结束")
+
 # ==========================================
 # 3. 核心执行与状态反馈
 # ==========================================
@@ -422,141 +600,91 @@ st.markdown("---")
 col_action, col_blank = st.columns([1, 2])
 
 # 构建 Config
-current_config = {
-    "product_requirements": {
-        "trading_stations": {"LMD": req_lmd, "Orundum": req_orundum},
-        "manufacturing_stations": {"Pure Gold": req_gold, "Originium Shard": req_shard, "Battle Record": req_record}
-    },
-    "trading_stations_count": n_trading,
-    "manufacturing_stations_count": n_manufacture,
-    "Fiammetta": {"enable": enable_fia},
-    "drones": {"enable": enable_drone, "order": drone_order, "targets": drone_targets}
-}
-
-# 校验逻辑：重新从 session_state 获取文本数据，确保万无一失
-raw_text_data = st.session_state.get("pasted_json_data", "")
-is_text_ready = len(raw_text_data.strip()) > 0
-is_file_ready = uploaded_ops is not None
-
-# 按钮激活条件
-is_config_valid = (current_m_total == n_manufacture) and ((req_lmd + req_orundum) == n_trading)
-is_data_ready = is_text_ready or is_file_ready
-
-if col_action.button("🚀 生成排班方案", type="primary", use_container_width=True,
-                     disabled=not (is_config_valid and is_data_ready)):
-
-    # ========================================================
-    # 🛡️ [修复核心] 更稳健的数据源读取逻辑
-    # ========================================================
-    operators_bytes = None
-
-    # 优先级 1: 文件上传
-    if uploaded_ops is not None:
-        operators_bytes = uploaded_ops.getvalue()
-
-    # 优先级 2: 粘贴板文本 (直接读 Session State，不依赖局部变量)
-    elif len(raw_text_data.strip()) > 0:
-        try:
-            # 再次验证 JSON 格式
-            json.loads(raw_text_data)
-            operators_bytes = raw_text_data.encode('utf-8')
-        except json.JSONDecodeError:
-            st.toast("❌ 粘贴的 JSON 格式无效，无法解析", icon="🚫")
-            st.stop()  # 停止执行
-
-    # 🛡️ 最后防线：防止 None 写入文件导致崩溃
-    if operators_bytes is None:
-        st.error("❌ 数据源读取失败：请确保已上传文件或粘贴了有效的 JSON 内容。", icon="🚫")
-        st.stop()
-
-    # ========================================================
-
-    # --- 核心修改：指定在顶部的容器中渲染 ---
-    with status_container:
-        with st.status("正在启动神经模拟环境...", expanded=True) as status:
-            # 初始化进度条
-            progress_bar = st.progress(0)
-
-            try:
-                # --- 阶段 1: 数据加载 (10%) ---
-                st.write("📥 读取干员练度数据...")
-                time.sleep(0.3)
-
-                # 写入临时文件 (此时 operators_bytes 一定不为 None)
-                with open("temp_ops.json", "wb") as f:
-                    f.write(operators_bytes)
+current_config = build_config(n_trading, n_manufacture, req_lmd, req_gold, req_record, req_shard,
+                              enable_fia=enable_fia, enable_drone=enable_drone,
+                              drone_targets=drone_targets, drone_order=drone_order)
 
-                progress_bar.progress(10)
+# 校验逻辑：直接使用导入时解析好的干员表 (文件上传优先)
+active_roster = uploaded_roster if uploaded_ops is not None else st.session_state.pasted_roster
 
-                # --- 阶段 2: 配置解析 (25%) ---
-                st.write("⚙️ 解析基建布局配置...")
-                time.sleep(0.4)
+# 与上一次计算所用的干员表比较，提示重新导入带来的练度变化
+if active_roster is not None and st.session_state.baseline is not None \
+        and active_roster.digest != st.session_state.baseline[0].digest:
+    roster_diff = active_roster.diff(st.session_state.baseline[0])
+    st.sidebar.caption(f"🔁 与上次计算相比：练度变化 {len(roster_diff['changed'])} · "
+                       f"新增 {len(roster_diff['added'])} · 移除 {len(roster_diff['removed'])}")
 
-                with open("temp_conf.json", "w", encoding='utf-8') as f:
-                    json.dump(current_config, f, ensure_ascii=False)
-
-                progress_bar.progress(25)
-
-                # --- 阶段 3: 算法初始化 (40%) ---
-                st.write("🧠 加载 WorkplaceOptimizer 核心算法...")
-                # 模拟加载大型模型的延迟
-                time.sleep(0.6)
-                optimizer = WorkplaceOptimizer(base_efficiency_path, "temp_ops.json", "temp_conf.json")
-
-                progress_bar.progress(40)
-
-                # --- 阶段 4: 计算当前最优解 (65%) ---
-                st.write("📊 正在演算当前练度最优解 (Monte Carlo / Greedy)...")
-                time.sleep(0.8)
-                curr = optimizer.get_optimal_assignments(ignore_elite=False)
-
-                progress_bar.progress(65)
-
-                # --- 阶段 5: 计算理论极限 (85%) ---
-                st.write("🔮 正在推演理论极限模型...")
-                time.sleep(0.5)
-                pot = optimizer.get_optimal_assignments(ignore_elite=True)
-
-                progress_bar.progress(85)
-
-                # --- 阶段 6: 差异分析与报告生成 (95%) ---
-                st.write("📈 生成练度提升路径分析报告...")
-                upgrades = optimizer.calculate_upgrade_requirements(curr, pot)
+# 按钮激活条件
+is_config_valid = (current_m_total == n_manufacture) and ((req_lmd + req_orundum) == n_trading)
+is_data_ready = active_roster is not None
 
-                # 结果处理逻辑
-                def clean(d):
-                    return {k: v for k, v in d.items() if k != 'raw_results'}
+run_clicked = col_action.button("🚀 生成排班方案", type="primary", use_container_width=True,
+                                disabled=not (is_config_valid and is_data_ready) or st.session_state.job_id is not None)
+# 全布局扫描只依赖干员数据，与当前布局设置无关 (菲亚梅塔/无人机设置沿用当前选择)
+sweep_clicked = col_action.button("🧭 全布局扫描", use_container_width=True,
+                                  help="评估全部 3 发电站布局与产物分配，按当前练度总效率排名",
+                                  disabled=not is_data_ready or st.session_state.job_id is not None)
 
-                txt = optimizer.get_suggestions_text(upgrades)
+if run_clicked or sweep_clicked:
 
-                time.sleep(0.4)
-                progress_bar.progress(95)
+    # 🛡️ 最后防线：防止空数据进入优化器导致崩溃
+    if active_roster is None:
+        st.error("❌ 数据源读取失败：请确保已上传文件或粘贴了有效的 JSON 内容。", icon="🚫")
+        st.stop()
 
-                # 保存到 Session State
-                st.session_state.results = {
-                    "curr": json.dumps(clean(curr), ensure_ascii=False, indent=2),
-                    "pot": json.dumps(clean(pot), ensure_ascii=False, indent=2),
-                    "txt": txt,
-                    "eff": curr['raw_results'][0].total_efficiency if curr['raw_results'] else 0
-                }
-                st.session_state.calculated = True
+    # 重新导入干员表时与上一次的结果比较，只移除或降低了方案未使用的干员时直接沿用
+    previous = None
+    if run_clicked and st.session_state.baseline is not None and st.session_state.calculated:
+        stored = get_result_store().get(st.session_state.results["key"])
+        if stored is not None:
+            base_roster, base_config = st.session_state.baseline
+            previous = dict(stored, roster=base_roster, config=base_config,
+                            restarts=st.session_state.results.get("restarts", 1))
+
+    # --- 提交到后台任务队列，结果由顶部容器中的状态面板轮询展示 ---
+    try:
+        job_id = get_job_manager().submit(active_roster, current_config, game_data,
+                                          kind="sweep" if sweep_clicked else "schedule", restarts=restarts,
+                                          previous=previous)
+    except JobQueueFull:
+        st.toast("⏳ 服务器繁忙，排队任务已满，请稍后再试", icon="🚫")
+        st.stop()
 
-                # 清理临时文件
-                if os.path.exists("temp_ops.json"): os.remove("temp_ops.json")
-                if os.path.exists("temp_conf.json"): os.remove("temp_conf.json")
+    st.session_state.job_id = job_id
+    st.session_state.job_notice = None
+    st.session_state.job_inputs = (active_roster, current_config)
+    st.session_state.job_restarts = restarts
 
-                # --- 完成 (100%) ---
-                progress_bar.progress(100)
-                time.sleep(0.2)
-                status.update(label="✅ 神经模拟完成！方案已生成", state="complete", expanded=False)
+    # 命中缓存等快速任务在本次运行内直接完成，无需等待下一次轮询
+    job = get_job_manager().get(job_id)
+    if job.wait(timeout=0.25):
+        finish_job(job)
 
-            except Exception as e:
-                status.update(label="❌ 计算过程中断", state="error")
-                st.error(f"错误详情: {str(e)}")
+# --- 核心修改：指定在顶部的容器中渲染 ---
+if st.session_state.job_id:
+    with status_container:
+        job_status_panel()
+elif st.session_state.job_notice:
+    notice = st.session_state.job_notice
+    st.session_state.job_notice = None
+    with status_container:
+        with st.status(notice["label"], state=notice["state"], expanded=notice["state"] == "error"):
+            if notice["state"] == "error":
+                st.error(f"错误详情: {notice['error']}")
                 # 打印详细堆栈以便调试
-                import traceback
-
-                st.code(traceback.format_exc())
+                st.code(notice["traceback"])
+
+# 缓存命中统计 (跨会话)
+cache_stats = get_result_cache().stats()
+job_stats = get_job_manager().stats()
+col_blank.caption(
+    f"♻️ 结果缓存：命中 {cache_stats['hits']} · 未命中 {cache_stats['misses']} · "
+    f"条目 {cache_stats['size']}/{cache_stats['maxsize']}  \n"
+    f"🧵 计算队列：运行 {job_stats['running']}/{job_stats['workers']} · 排队 {job_stats['queued']}"
+)
+if get_disk_store() is not None:
+    disk_stats = get_disk_store().stats()
+    col_blank.caption(f"💾 持久化存储：命中 {disk_stats['hits']} · 条目 {disk_stats['size']}/{disk_stats['max_entries']}")
 
 # ==========================================
 # 4. 结果仪表盘
@@ -568,12 +696,21 @@ if st.session_state.calculated:
 
     # 关键指标展示
     m1, m2, m3 = st.columns(3)
-    m1.metric("首班总效率", f"{res['eff']:.2f}%", delta="当前练度")
-    m2.metric("排班方案", "3班轮换", help="固定为3班倒模式")
+    m1.metric("首班总效率", f"{res['eff']:.2f}%", delta="当前练度",
+              help=(f"理论极限方案 {res['bound']:.2f}%，差距 {res['gap']:.2f}%"
+                    if res.get("bound") is not None else "理论极限方案尚未完成"))
+    m2.metric("排班方案", f"{res.get('shifts', 3)}班轮换", help="方案中的班次数量")
     m3.metric("基建类型", f"{n_trading}{n_manufacture}{9 - n_trading - n_manufacture}")
 
     st.markdown("#### 📥 方案下载")
 
+    # 下载内容在点击时才生成，不随每次 rerun 重新发送
+    base_roster, base_config = st.session_state.baseline
+
+    def payload(part):
+        return functools.partial(result_payload, get_job_manager(), res["key"], part,
+                                 base_roster, base_config, game_data, res.get("restarts", 1))
+
     # 下载区使用卡片式布局
     d1, d2, d3 = st.columns(3)
 
@@ -581,23 +718,140 @@ if st.session_state.calculated:
         with st.container(border=True):
             st.markdown("**📄 当前方案**")
             st.caption("基于您现有的干员练度")
-            st.download_button("下载 JSON", res['curr'], "当前方案.json", "application/json", use_container_width=True)
+            st.download_button("下载 JSON", payload("curr"), "当前方案.json", "application/json", use_container_width=True)
 
     with d2:
         with st.container(border=True):
             st.markdown("**🔮 极限方案**")
             st.caption("忽略练度限制的理论最优")
-            st.download_button("下载 JSON", res['pot'], "潜在方案-仅供参考.json", "application/json", use_container_width=True)
+            st.download_button("下载 JSON", payload("pot"), "潜在方案-仅供参考.json", "application/json",
+                               use_container_width=True, disabled=res.get("partial", False))
 
     with d3:
         with st.container(border=True):
             st.markdown("**📈 提升建议**")
             st.caption("性价比最高的练度提升路径")
-            st.download_button("下载 报告", res['txt'], "提升建议.txt", "text/plain", use_container_width=True)
+            st.download_button("下载 报告", payload("txt"), "提升建议.txt", "text/plain",
+                               use_container_width=True, disabled=res.get("partial", False))
+
+    if res.get("spread", {}).get("curr"):
+        effs = res["spread"]["curr"]
+        if len(effs) < res.get("restarts", 1) and effs[0] == effs[-1]:
+            st.caption("🔬 不同随机种子得到的方案完全相同 (搜索结果与种子无关)，已提前结束重复搜索")
+        else:
+            st.caption(f"🔬 {len(effs)} 次搜索的当前方案效率：{effs[0]:.2f}% ~ {effs[-1]:.2f}%，已取最优")
+
+    if res.get("partial"):
+        st.caption("⏱️ 已达到单次计算时间预算：极限方案与提升建议仍在后台计算，稍后重新生成即可直接取用。")
+
+    # 调试面板：URL 加上 ?debug=1 时显示
+    if st.query_params.get("debug") == "1" and "debug" in res:
+        with st.expander("🛠️ 调试信息 (分阶段耗时 / 计数器)", expanded=False):
+            dbg = res["debug"]
+            st.caption(f"总耗时 {dbg['elapsed']:.3f}s")
+            st.table([{"阶段": k, "耗时 (ms)": round(v * 1000, 2)} for k, v in dbg["timings"].items()])
+            st.json(dbg["counters"])
+            st.markdown("**进程累计指标**")
+            st.json(metrics.REGISTRY.snapshot())
+
+    # 换班模拟：按 24 小时推进心情、菲亚梅塔充能与无人机，估算换班延迟造成的效率损失
+    stored = get_result_store().get(res["key"])
+    if stored is not None:
+        with st.expander("⏱️ 换班模拟 (心情 / 无人机)", expanded=False):
+            compiled = compile_plan(stored["curr"])
+            t1, t2 = st.columns(2)
+            rotations = [2, 3, 4]
+            n_shifts = t1.selectbox("轮换班次", rotations, format_func=lambda n: f"{n} 班",
+                                    index=rotations.index(res["shifts"]) if res["shifts"] in rotations else 1)
+            late = t2.slider("某一次换班晚了 (小时)", 0.0, 8.0, 1.0, 0.5)
+            # 按生成该方案时的菲亚梅塔设置模拟，而不是侧边栏当前的开关
+            sim = simulate(compiled, shifts=n_shifts, delays=[late] + [0.0] * (n_shifts - 1),
+                           fiammetta=base_config["Fiammetta"]["enable"])
+            k1, k2, k3 = st.columns(3)
+            k1.metric("准时换班", f"{sim['on_time']:.2f}%")
+            k2.metric("延迟后", f"{sim['efficiency']:.2f}%", delta=f"{-sim['delay_loss']:.2f}%")
+            k3.metric("无人机浪费", f"{sim['drones_wasted']:.0f}", help="积满上限后无法积累的无人机数量 (每天)")
+            st.dataframe(
+                [{"轮换": f"{r['shifts']} 班", "理论效率 (%)": round(r["ideal"], 2),
+                  "计入心情后 (%)": round(r["on_time"], 2), "无人机使用": round(r["drones_used"])}
+                 for r in compare_rotations(compiled)],
+                hide_index=True, use_container_width=True
+            )
+            st.caption("模拟按基础心情消耗/恢复速度估算，未计入干员技能对心情的修正。")
+
+    # 练度模拟：以本次计算的干员表为基准，修改少数干员的精英化阶段后重新计算当前方案
+    with st.expander("🧪 练度模拟 (What-if)", expanded=False):
+        promotable = {f"{op.name} (精{op.elite})": op for op in promotion_candidates(base_roster)}
+        w1, w2 = st.columns([3, 1])
+        picked = w1.multiselect("精英化干员", list(promotable), placeholder="选择要模拟精英化的干员")
+        target = w2.selectbox("目标阶段", [1, 2], index=1, format_func=lambda e: f"精英{e}")
+        # 目标阶段不超过各干员星级的上限 (例如 3★ 最高精英1)
+        changes = {promotable[k].id: min(target, max_elite(promotable[k])) for k in picked
+                   if min(target, max_elite(promotable[k])) > promotable[k].elite}
+        capped = [k for k in picked if max_elite(promotable[k]) < target]
+        if capped:
+            w1.caption("已按星级上限模拟：" + "、".join(f"{k} 最高精英{max_elite(promotable[k])}" for k in capped))
+        b1, b2 = st.columns(2)
+        if b1.button("模拟", use_container_width=True,
+                     disabled=not changes or st.session_state.job_id is not None):
+            # 与其他计算一样交给后台任务队列 (受并发数与排队上限约束)
+            try:
+                st.session_state.job_id = get_job_manager().submit(base_roster, base_config, game_data,
+                                                                   kind="whatif", changes=changes)
+                st.session_state.job_notice = None
+                st.rerun()
+            except JobQueueFull:
+                st.toast("⏳ 服务器繁忙，排队任务已满，请稍后再试", icon="🚫")
+        if b2.button("📊 评估全部单干员精英化", use_container_width=True,
+                     help="逐一模拟每名干员精英化一阶，按每万龙门币带来的效率提升排序",
+                     disabled=st.session_state.job_id is not None):
+            try:
+                st.session_state.job_id = get_job_manager().submit(base_roster, base_config, game_data,
+                                                                   kind="promote")
+                st.session_state.job_notice = None
+                st.rerun()
+            except JobQueueFull:
+                st.toast("⏳ 服务器繁忙，排队任务已满，请稍后再试", icon="🚫")
+
+        sim = st.session_state.whatif
+        if sim is not None:
+            s1, s2 = st.columns(2)
+            s1.metric("模拟后首班总效率", f"{sim['total_efficiency']:.2f}%", delta=f"{sim['delta']:+.2f}%")
+            s2.metric("所需龙门币", f"{sim['cost']:,}")
+            if sim["changed_rooms"]:
+                st.caption("受影响的房间：" + "、".join(f"{room} #{i}" for room, i in sim["changed_rooms"]))
+            else:
+                st.caption("首班房间分配没有变化")
+
+        ranking = st.session_state.promotions
+        if ranking:
+            st.caption(f"已评估 {ranking['evaluated']}/{ranking['total']} 名干员，"
+                       f"基准效率 {ranking['base_efficiency']:.2f}%")
+            st.dataframe(
+                [{"干员": r["name"], "精英化": f"精{r['from']} → 精{r['to']}",
+                  "效率变化 (%)": round(r["delta"], 2), "龙门币": r["cost"],
+                  "每万龙门币收益 (%)": round(r["gain_per_10k"], 3),
+                  "受影响房间": len(r["changed_rooms"])}
+                 for r in ranking["rows"]],
+                hide_index=True, use_container_width=True
+            )
 
     # 底部指南
     st.info("""
     **💡 如何使用导出的 JSON？**
     1. **自动化**: **基建换班** -> 启用 **自定义排班** -> 选择文件。
     2. **可视化**: 前往 [**一图流工具**](https://ark.yituliu.cn/tools/scheduleV2) 导入文件预览排班详情。
-    """)
\ No newline at end of file
+    """)
+
+# ==========================================
+# 5. 全布局扫描排名
+# ==========================================
+if st.session_state.sweep:
+    sweep = st.session_state.sweep
+    st.markdown("### 🧭 全布局排名")
+    st.caption(f"共评估 {sweep['evaluated']}/{sweep['total']} 种布局与产物分配 (当前练度)，按首班总效率排序")
+    st.dataframe(
+        [{"排名": i + 1, "布局": r["label"], "首班总效率 (%)": round(r["total_efficiency"], 2)}
+         for i, r in enumerate(sweep["rows"])],
+        hide_index=True, use_container_width=True
+    )
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+# 批量排班命令行工具 (无界面)
+# ==========================================
+# 对一个目录下的多份 MAA 干员导出 × 多个布局并行生成排班，
+# 每个 (干员文件, 布局) 输出一行 JSONL，顺序固定，可断点续跑。
+#
+# 用法示例:
+#   python batch.py rosters/ -l 2-4-3 -l 3-3-3 -l my_layout.json -o results.jsonl
+#   python batch.py rosters/ -o results.jsonl --resume     # 跳过已成功的组合，重算失败的组合
+#   python batch.py rosters/ --store results.db -o /dev/null  # 预先填充服务端的持久化存储
+
+
+def load_layouts(specs):
+    # 布局参数：预设名 (2-4-3 / 3-3-3 / 1-5-3) 或 current_config 格式的 JSON 文件
+    from layouts import LAYOUT_PRESETS, preset_config
+
+    layouts = []
+    for spec in specs or list(LAYOUT_PRESETS):
+        if spec in LAYOUT_PRESETS:
+            layouts.append((spec, preset_config(spec)))
+        else:
+            with open(spec, encoding='utf-8') as f:
+                layouts.append((os.path.splitext(os.path.basename(spec))[0], json.load(f)))
+    return layouts
+
+
+def list_rosters(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json"))
+
+
+def compact_output(path):
+    # 续跑前整理已有输出并原子地重写：丢弃中断时写了一半的末行、失败的记录 (稍后重新计算并追加)
+    # 以及重复的记录，保证每个组合只有一行。返回成功完成的 (roster, layout) 集合
+    done = set()
+    if not os.path.exists(path):
+        return done
+    kept = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # 上次中断时写了半行
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            key = (record.get("roster"), record.get("layout"))
+            if record.get("error") or key in done:
+                continue
+            done.add(key)
+            kept.append(line)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding='utf-8') as f:
+        f.writelines(kept)
+    os.replace(tmp, path)
+    return done
+
+
+_stores = {}
+
+
+def _open_store(path):
+    # 每个工作进程只打开一次持久化存储
+    if path not in _stores:
+        from store import ResultStore
+        _stores[path] = ResultStore(path)
+    return _stores[path]
+
+
+def run_one(roster_path, layout_name, config, budget=None, store_path=None):
+    # 工作进程入口：完成一个 (干员文件, 布局) 组合
+    from pipeline import run_pipeline, clean
+
+    record = {"roster": os.path.basename(roster_path), "layout": layout_name}
+    started = time.perf_counter()
+    try:
+        with open(roster_path, "rb") as f:
+            result = run_pipeline(f.read(), config, budget=budget,
+                                  store=_open_store(store_path) if store_path else None)
+        record.update({
+            "total_efficiency": result["eff"],
+            "pot_efficiency": result["bound"],
+            "curr": clean(result["curr"]),
+            "pot": clean(result["pot"]) if result["pot"] is not None else None,
+            "suggestions": result["txt"],
+            "partial": result["partial"],
+            "timings": result["timings"],
+            "error": None,
+        })
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed"] = time.perf_counter() - started
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成 MAA 基建排班 (JSONL 输出)")
+    parser.add_argument("rosters", help="存放 MAA 干员导出 (*.json) 的目录")
+    parser.add_argument("-l", "--layout", action="append", dest="layouts",
+                        help="布局预设名或 current_config JSON 文件，可重复；默认全部预设")
+    parser.add_argument("-o", "--output", help="输出 JSONL 文件 (默认标准输出)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument("--resume", action="store_true", help="跳过输出文件中已成功的组合，重新计算失败的组合并追加写入")
+    parser.add_argument("--store", help="持久化结果存储 (SQLite) 路径：已有结果直接读取，新结果写入，"
+                                        "可用于预先填充服务端存储")
+    parser.add_argument("--budget", type=float, help="单个组合的时间预算 (秒)，默认不限；"
+                                                     "到期后不再计算理论极限方案与提升建议")
+    args = parser.parse_args(argv)
+
+    layouts = load_layouts(args.layouts)
+    done = compact_output(args.output) if args.resume and args.output else set()
+    all_tasks = [(path, name, config) for path in list_rosters(args.rosters) for name, config in layouts]
+    tasks = [task for task in all_tasks if (os.path.basename(task[0]), task[1]) not in done]
+
+    # 并行度已由本工具的进程数控制，单个任务内不再二次并行
+    os.environ["MAA_SEARCH_WORKERS"] = "1"
+
+    out = open(args.output, "a" if args.resume else "w", encoding='utf-8') if args.output else sys.stdout
+    failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            # 按提交顺序输出：结果顺序与进程调度无关
+            futures = [pool.submit(run_one, *task, budget=args.budget, store_path=args.store) for task in tasks]
+            for future in futures:
+                record = future.result()
+                failed += bool(record["error"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"完成 {len(tasks)} 个组合 (跳过 {len(all_tasks) - len(tasks)}，失败 {failed})", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
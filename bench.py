@@ -0,0 +1,249 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from layouts import LAYOUT_PRESETS, build_config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ==========================================
+# 排班算法基准测试
+# ==========================================
+# 用固定随机种子生成 MAA 格式的合成干员表 (50–400 人)，遍历布局预设、贸易站 / 制造站产物分配
+# 以及菲亚梅塔/无人机开关，记录各阶段耗时、峰值内存与总效率，输出 JSON 结果文件。
+# 指定 --baseline 时与历史结果比较，超出阈值即以非零状态退出，可用于 logic 升级把关。
+#
+# 用法示例:
+#   python bench.py -o bench_output.json
+#   python bench.py --sizes 50 200 --baseline old.json --max-slowdown 1.2
+#   python bench.py --sizes 50 --presets 3-3-3 -j 4
+
+# 合成干员表使用的干员池：(id, 名称, 星级)
+OPERATOR_POOL = [
+    ("char_002_amiya", "阿米娅", 5), ("char_010_chen", "陈", 6), ("char_017_huang", "煌", 6),
+    ("char_101_sora", "空", 5), ("char_102_texas", "德克萨斯", 5), ("char_103_angel", "能天使", 6),
+    ("char_106_franka", "芙兰卡", 5), ("char_107_liskam", "雷蛇", 5), ("char_108_silent", "赫默", 5),
+    ("char_109_fmout", "远山", 4), ("char_112_siege", "推进之王", 6), ("char_115_headbr", "凛冬", 5),
+    ("char_118_yuki", "白雪", 4), ("char_120_hibisc", "芙蓉", 3), ("char_121_lava", "炎熔", 3),
+    ("char_123_fang", "芬", 3), ("char_124_kroos", "克洛丝", 3), ("char_126_shotst", "流星", 4),
+    ("char_128_plosis", "白面鸮", 5), ("char_130_doberm", "杜宾", 4), ("char_134_ifrit", "伊芙利特", 6),
+    ("char_136_hsguma", "星熊", 6), ("char_141_nights", "夜烟", 4), ("char_143_ghost", "幽灵鲨", 5),
+    ("char_144_red", "红", 5), ("char_145_prove", "普罗旺斯", 5), ("char_147_shining", "闪灵", 6),
+    ("char_148_nearl", "临光", 5), ("char_149_scave", "清道夫", 4), ("char_151_myrtle", "桃金娘", 4),
+    ("char_155_tiger", "因陀罗", 5), ("char_163_hpsts", "火神", 5), ("char_166_skfire", "天火", 5),
+    ("char_171_bldsk", "华法琳", 5), ("char_172_svrash", "银灰", 6), ("char_173_slchan", "崖心", 5),
+    ("char_174_slbell", "初雪", 5), ("char_179_cgbird", "夜魔", 5), ("char_180_amgoat", "艾雅法拉", 6),
+    ("char_181_flower", "调香师", 4), ("char_185_frncat", "慕斯", 4), ("char_187_ccheal", "嘉维尔", 4),
+    ("char_188_helage", "赫拉格", 6), ("char_192_falco", "翎羽", 3), ("char_196_sunbr", "古米", 4),
+    ("char_201_moeshd", "可颂", 5), ("char_202_demkni", "塞雷娅", 6), ("char_204_platnm", "白金", 5),
+    ("char_208_melan", "玫兰莎", 3), ("char_209_ardign", "卡缇", 3), ("char_210_stward", "史都华德", 3),
+    ("char_211_adnach", "安德切尔", 3), ("char_212_ansel", "安赛尔", 3), ("char_213_mostma", "莫斯提马", 6),
+    ("char_215_mantic", "狮蝎", 5), ("char_220_grani", "格拉尼", 5), ("char_222_bpipe", "风笛", 6),
+    ("char_226_hmau", "吽", 5), ("char_235_jesica", "杰西卡", 4), ("char_236_rope", "暗索", 4),
+    ("char_237_gravel", "砾", 4), ("char_240_wyvern", "香草", 3), ("char_241_panda", "食铁兽", 5),
+    ("char_242_otter", "梅尔", 5), ("char_243_waaifu", "槐琥", 5), ("char_248_mgllan", "麦哲伦", 6),
+    ("char_250_phatom", "傀影", 6), ("char_252_bibeak", "柏喙", 5), ("char_253_greyy", "灰喉", 5),
+    ("char_254_vodfox", "巫恋", 5), ("char_263_skadi", "斯卡蒂", 6), ("char_264_f12yin", "山", 6),
+    ("char_274_astesi", "星极", 5), ("char_275_breeze", "微风", 5), ("char_277_sqrrel", "阿消", 4),
+    ("char_278_orchid", "梓兰", 3), ("char_281_popka", "泡普卡", 3), ("char_283_midn", "月见夜", 3),
+    ("char_284_spot", "斑点", 3), ("char_285_medic2", "Lancet-2", 1), ("char_286_cast3", "Castle-3", 1),
+    ("char_290_vigna", "红豆", 4), ("char_291_aglina", "安洁莉娜", 6), ("char_293_thorns", "棘刺", 6),
+    ("char_298_susuro", "苏苏洛", 4), ("char_300_phenxi", "菲亚梅塔", 6), ("char_308_swire", "诗怀雅", 5),
+    ("char_311_mudrok", "泥岩", 6), ("char_326_glacus", "格劳克斯", 5), ("char_332_archet", "空弦", 6),
+    ("char_337_utage", "宴", 4), ("char_340_shwaz", "黑", 6), ("char_343_tknogi", "月禾", 5),
+    ("char_344_beewax", "蜜蜡", 5), ("char_346_aosta", "奥斯塔", 5), ("char_348_ceylon", "锡兰", 5),
+    ("char_350_surtr", "史尔特尔", 6), ("char_356_broca", "布洛卡", 5), ("char_358_lisa", "铃兰", 6),
+    ("char_362_saga", "嵯峨", 6), ("char_366_acdrop", "酸糖", 4), ("char_377_gdglow", "澄闪", 6),
+    ("char_383_snsant", "雪雉", 5), ("char_388_mint", "薄绿", 5), ("char_400_weedy", "温蒂", 6),
+    ("char_401_elysm", "极境", 5), ("char_405_absin", "苦艾", 5), ("char_411_tomimi", "特米米", 5),
+    ("char_415_flint", "燧石", 5), ("char_416_zumama", "森蚺", 6), ("char_421_crow", "羽毛笔", 5),
+    ("char_426_billro", "卡涅利安", 6), ("char_437_mizuki", "水月", 6), ("char_440_pinecn", "松果", 4),
+    ("char_455_nothin", "乌有", 5), ("char_456_ash", "灰烬", 6), ("char_459_tachak", "战车", 6),
+    ("char_472_pasngr", "异客", 6), ("char_473_mberry", "桑葚", 5), ("char_474_glady", "歌蕾蒂娅", 6),
+    ("char_478_kirara", "绮良", 5), ("char_479_sleach", "琴柳", 6), ("char_485_pallas", "帕拉斯", 6),
+    ("char_487_bobb", "波卜", 4), ("char_1012_skadi2", "浊心斯卡蒂", 6), ("char_1013_chen2", "假日威龙陈", 6),
+    ("char_1014_nearl2", "耀骑士临光", 6), ("char_2014_nian", "年", 6), ("char_2015_dusk", "夕", 6),
+    ("char_2023_ling", "令", 6), ("char_2024_chyue", "重岳", 6), ("char_003_kalts", "凯尔希", 6),
+    ("char_4009_irene", "艾丽妮", 6), ("char_4042_lumen", "流明", 6), ("char_1028_texas2", "缄默德克萨斯", 6),
+]
+
+# 各星级在每个精英阶段的等级上限 (索引为精英化阶段)
+LEVEL_CAPS = {1: [30], 2: [30], 3: [40, 55], 4: [45, 60, 70], 5: [50, 70, 80], 6: [50, 80, 90]}
+
+FLAG_COMBOS = [(True, True), (True, False), (False, True), (False, False)]
+
+
+def make_roster(size, seed=0):
+    # 生成 MAA「干员识别」格式的合成干员表；超出干员池的部分用无基建技能的占位干员补足
+    rng = random.Random(f"{seed}:{size}")
+    pool = list(OPERATOR_POOL)
+    rng.shuffle(pool)
+    roster = []
+    for i in range(size):
+        if i < len(pool):
+            op_id, name, rarity = pool[i]
+        else:
+            op_id, name, rarity = f"char_9{i:03d}_bench", f"合成干员{i}", rng.randint(3, 5)
+        caps = LEVEL_CAPS[rarity]
+        elite = rng.randrange(len(caps))
+        roster.append({
+            "id": op_id,
+            "name": name,
+            "elite": elite,
+            "level": rng.randint(1, caps[elite]),
+            "own": True,
+            "potential": rng.randint(1, 6),
+            "rarity": rarity,
+        })
+    return roster
+
+
+def product_splits(p):
+    # 预设站点数量下的全部产物分配：(龙门币贸易站数, 赤金, 经验书, 源石碎片)
+    splits = []
+    for lmd in range(p["trading"], -1, -1):
+        for gold in range(p["manufacture"], -1, -1):
+            for record in range(p["manufacture"] - gold, -1, -1):
+                splits.append((lmd, gold, record, p["manufacture"] - gold - record))
+    return splits
+
+
+def make_cases(sizes, presets=None):
+    # 每个预设 × 全部贸易站 / 制造站产物分配 × 菲亚梅塔/无人机开关 × 干员规模
+    cases = []
+    for size in sizes:
+        for name in presets or list(LAYOUT_PRESETS):
+            p = LAYOUT_PRESETS[name]
+            for lmd, gold, record, shard in product_splits(p):
+                for fia, drone in FLAG_COMBOS:
+                    cases.append({
+                        "id": f"n{size}-{name}-{lmd}L-{gold}G{record}R{shard}S-fia{int(fia)}-drone{int(drone)}",
+                        "size": size,
+                        "config": build_config(p["trading"], p["manufacture"], lmd, gold, record, shard,
+                                               enable_fia=fia, enable_drone=drone),
+                    })
+    return cases
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_case(case, seed):
+    # 工作进程入口：每个用例在独立进程中执行，保证峰值内存互不影响
+    from pipeline import build_optimizer, first_efficiency
+
+    roster = make_roster(case["size"], seed)
+    timings = {}
+
+    def timed(phase, func, *args, **kwargs):
+        started = time.perf_counter()
+        value = func(*args, **kwargs)
+        timings[phase] = time.perf_counter() - started
+        return value
+
+    record = {"id": case["id"], "size": case["size"]}
+    try:
+        optimizer = timed("init", build_optimizer, roster, case["config"])
+        curr = timed("curr", optimizer.get_optimal_assignments, ignore_elite=False)
+        pot = timed("pot", optimizer.get_optimal_assignments, ignore_elite=True)
+        upgrades = timed("upgrade", optimizer.calculate_upgrade_requirements, curr, pot)
+        timed("suggestions", optimizer.get_suggestions_text, upgrades)
+        record.update({
+            "curr_efficiency": first_efficiency(curr),
+            "pot_efficiency": first_efficiency(pot),
+            "error": None,
+        })
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["timings"] = timings
+    record["wall"] = sum(timings.values())
+    record["peak_rss_mb"] = peak_rss_mb()
+    return record
+
+
+def compare(results, baseline, max_slowdown, max_rss_growth, max_eff_drop):
+    # 与基线结果逐用例比较，返回超出阈值的问题列表
+    base = {case["id"]: case for case in baseline["cases"]}
+    problems = []
+    for case in results["cases"]:
+        old = base.get(case["id"])
+        if old is None or old.get("error"):
+            continue
+        if case.get("error"):
+            problems.append(f"{case['id']}: 运行失败 ({case['error']})")
+            continue
+        if old["wall"] > 0 and case["wall"] > old["wall"] * max_slowdown:
+            problems.append(f"{case['id']}: 耗时 {old['wall']:.3f}s -> {case['wall']:.3f}s")
+        if old.get("peak_rss_mb") and case.get("peak_rss_mb") and \
+                case["peak_rss_mb"] > old["peak_rss_mb"] * max_rss_growth:
+            problems.append(f"{case['id']}: 峰值内存 {old['peak_rss_mb']:.1f}MB -> {case['peak_rss_mb']:.1f}MB")
+        for key in ("curr_efficiency", "pot_efficiency"):
+            if case[key] < old[key] - max_eff_drop:
+                problems.append(f"{case['id']}: {key} {old[key]:.2f} -> {case[key]:.2f}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="排班算法基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 400], help="合成干员表规模")
+    parser.add_argument("--seed", type=int, default=0, help="合成干员表随机种子")
+    parser.add_argument("--presets", nargs="+", choices=list(LAYOUT_PRESETS), help="只测试部分布局预设 (默认全部)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="并行进程数 (>1 时耗时可能互相干扰)")
+    parser.add_argument("-o", "--output", default="bench_output.json", help="结果文件")
+    parser.add_argument("--baseline", help="用于回归比较的历史结果文件")
+    parser.add_argument("--max-slowdown", type=float, default=1.25, help="单用例耗时允许的最大倍数")
+    parser.add_argument("--max-rss-growth", type=float, default=1.25, help="单用例峰值内存允许的最大倍数")
+    parser.add_argument("--max-eff-drop", type=float, default=0.0, help="总效率允许的最大下降值 (百分点)")
+    args = parser.parse_args(argv)
+
+    from gamedata import LOGIC_VERSION, get_game_data
+
+    cases = make_cases(args.sizes, args.presets)
+    started = time.time()
+    # max_tasks_per_child=1：每个用例一个新进程，峰值内存按用例统计
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), max_tasks_per_child=1) as pool:
+        records = list(pool.map(run_case, cases, [args.seed] * len(cases)))
+
+    results = {
+        "meta": {
+            "logic_version": LOGIC_VERSION,
+            "game_data_version": get_game_data().version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "started_at": started,
+            "duration": time.time() - started,
+        },
+        "cases": records,
+    }
+    with open(args.output, "w", encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failed = [r for r in records if r["error"]]
+    print(f"完成 {len(records)} 个用例 (失败 {len(failed)})，结果已写入 {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.max_slowdown, args.max_rss_growth, args.max_eff_drop)
+        for line in problems:
+            print(f"⚠️ 回归: {line}", file=sys.stderr)
+        if problems:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
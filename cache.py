@@ -0,0 +1,65 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# 跨会话结果缓存
+# ==========================================
+# 以「干员数据 + 配置 + 变体」的规范化哈希为键，缓存排班计算结果。
+# 同一进程内所有 Streamlit 会话共享一个实例，按容量 (LRU) 与存活时间 (TTL) 淘汰。
+
+
+def canonical_hash(*parts):
+    # 对任意 JSON 兼容对象做规范化序列化 (键排序、紧凑分隔符) 后取 SHA-256
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode('utf-8'))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, maxsize=128, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl and time.monotonic() - item[0] > self.ttl:
+                # 过期条目直接丢弃
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._data)
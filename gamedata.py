@@ -0,0 +1,63 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+import logic
+
+# ==========================================
+# 进程级基础数据 (游戏数据层)
+# ==========================================
+# 基建技能 / 效率表随 logic 编译产物一起发布 ("internal")，由 WorkplaceOptimizer 自行读取。
+# 这里不加载数据本身，只为每个数据路径生成一次不可变的 GameData (路径 + 版本戳)，
+# 供所有会话与 WorkplaceOptimizer 实例共用，版本戳用于缓存 / 持久化存储的失效。
+
+LOGIC_VERSION = getattr(logic, "VERSION", "1.0.0")
+
+GameData = namedtuple("GameData", ["path", "version", "loaded_at"])
+
+_game_data = {}
+_lock = threading.Lock()
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _version_stamp(path):
+    # logic 版本号 + 编译产物 (及外部数据文件) 的内容哈希：重新构建 logic 后版本戳随之变化，
+    # 而同一构建安装在不同机器上时版本戳相同，批处理预先写入的持久化结果可以直接命中
+    parts = [LOGIC_VERSION]
+    logic_file = getattr(logic, "__file__", None)
+    if logic_file and os.path.isfile(logic_file):
+        parts.append(_file_digest(logic_file))
+    if path == "internal":
+        parts.append(path)
+    elif os.path.isfile(path):
+        parts.append(_file_digest(path))
+    return ":".join(parts)
+
+
+def get_game_data(path="internal"):
+    # 首次调用时生成版本戳，之后始终返回同一个对象
+    data = _game_data.get(path)
+    if data is not None:
+        return data
+    with _lock:
+        data = _game_data.get(path)
+        if data is None:
+            data = GameData(path=path, version=_version_stamp(path), loaded_at=time.time())
+            _game_data[path] = data
+    return data
+
+
+def reload_game_data(path="internal"):
+    # 显式失效：下次 get_game_data 重新生成版本戳
+    with _lock:
+        _game_data.pop(path, None)
+    return get_game_data(path)
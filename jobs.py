@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import ResultCache, canonical_hash
+from gamedata import get_game_data
+from pipeline import SEARCH_BUDGET, load_operators, run_pipeline, sweep_layouts
+from roster import Roster
+from whatif import rank_promotions, what_if
+
+# ==========================================
+# 后台排班任务队列
+# ==========================================
+# 点击「生成排班方案」后只提交任务并拿到 job_id，计算在后台执行：
+#   - 任务线程数固定 (并发上限)，搜索本身仍交给 pipeline 的共享进程池；
+#   - 排队 + 运行中的任务数有上限，超出时直接拒绝 (背压)；
+#   - 任务状态保存在进程内，页面 rerun 不会丢失进行中的计算；
+#   - 排班完成后方案本体按结果句柄放入有上限的 results，任务本身只保留句柄与指标；
+#   - 相同干员表 + 配置的任务仍在进行时，新的提交直接共用该任务 (请求合并)。
+
+MAX_JOB_WORKERS = int(os.environ.get("MAA_JOB_WORKERS", 2))
+MAX_JOB_QUEUE = int(os.environ.get("MAA_JOB_QUEUE", 16))
+JOB_RETENTION = 30 * 60  # 已结束任务的保留时间 (秒)
+SWEEP_BUDGET = float(os.environ.get("MAA_SWEEP_BUDGET", 120))  # 全布局扫描 / 精英化排名的时间预算 (秒)
+RESULT_STORE_SIZE = 256  # 已完成排班的方案本体按结果句柄保存的条目上限
+SCAN_CACHE_SIZE = 4096  # 扫描结果缓存的条目上限 (每条只是一个总效率数值)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, job_id, kind="schedule"):
+        self.id = job_id
+        self.kind = kind  # schedule: 单次排班 / sweep: 全布局扫描 / promote: 精英化收益排名 / whatif: 练度模拟
+        self.state = "queued"  # queued / running / done / error
+        self.phase = None
+        self.label = "⏳ 排队等待计算资源..."
+        self.percent = 0
+        self.log = []
+        self.best = None  # 计算过程中推送的当前最优结果 {"efficiency", "bound", "label"}
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in ("done", "error")
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _on_improve(self, best):
+        self.best = best
+
+    def _on_progress(self, phase, label, percent):
+        if phase in ("sweep", "promote") and self.phase == phase:
+            # 扫描进度只更新最后一行，避免逐条刷屏
+            self.log[-1] = label
+        elif phase != "done":
+            self.log.append(label)
+        self.phase = phase
+        self.label = label
+        self.percent = percent
+
+
+class JobManager:
+
+    def __init__(self, max_workers=MAX_JOB_WORKERS, max_queue=MAX_JOB_QUEUE, cache=None, store=None, scan_cache=None,
+                 results=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.cache = cache
+        self.store = store  # 持久化结果存储 (store.ResultStore)，可选
+        # 结果句柄 -> {"curr", "pot", "txt"}；已结束的任务在保留期内不再持有方案本体
+        self.results = results if results is not None else ResultCache(maxsize=RESULT_STORE_SIZE, ttl=24 * 3600)
+        # 全布局扫描 / 精英化排名的结果单独缓存 (只存总效率等摘要)，不占用共享方案缓存的容量
+        self.scan_cache = scan_cache if scan_cache is not None else ResultCache(maxsize=SCAN_CACHE_SIZE, ttl=6 * 3600)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="maa-job")
+        self._jobs = {}
+        self._inflight = {}  # 合并键 -> 进行中的任务 id
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def submit(self, operators, config, game_data=None, kind="schedule", restarts=1, previous=None, changes=None):
+        # changes: 练度模拟 (kind="whatif") 的 {干员 id: 目标精英化阶段}
+        roster = operators if isinstance(operators, Roster) else Roster.from_list(load_operators(operators))
+        # 带 previous 的任务可能沿用会话自己的旧方案，只与同一旧干员表的任务合并
+        based_on = previous["roster"].candidates().digest if previous is not None else None
+        key = canonical_hash(kind, (game_data or get_game_data()).version, roster.candidates().digest,
+                             config, restarts, changes, based_on)
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(self._inflight.get(key))
+            if job is not None and not job.finished:
+                self.coalesced += 1
+                return job.id
+            if self.pending() >= self.max_workers + self.max_queue:
+                raise JobQueueFull(f"当前排队任务已达上限 ({self.max_queue})")
+            job = Job(uuid.uuid4().hex, kind)
+            self._jobs[job.id] = job
+            self._inflight[key] = job.id
+        self._executor.submit(self._run, job, roster, config, game_data, restarts, previous, changes)
+        return job.id
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def plans(self, job):
+        # 已完成排班任务的方案本体 {"curr", "pot", "txt"}；已被淘汰时返回 None
+        return self.results.get(job.result["key"])
+
+    def pending(self):
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "queued": sum(1 for j in jobs if j.state == "queued"),
+            "running": sum(1 for j in jobs if j.state == "running"),
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "coalesced": self.coalesced,
+        }
+
+    def _run(self, job, operators, config, game_data, restarts=1, previous=None, changes=None):
+        job.state = "running"
+        try:
+            if job.kind == "sweep":
+                job.result = sweep_layouts(operators, config, game_data, budget=SWEEP_BUDGET,
+                                           cache=self.cache, progress=job._on_progress,
+                                           on_improve=job._on_improve, store=self.store,
+                                           scan_cache=self.scan_cache)
+            elif job.kind == "promote":
+                job.result = rank_promotions(operators, config, game_data, cache=self.cache,
+                                             budget=SWEEP_BUDGET, progress=job._on_progress,
+                                             scan_cache=self.scan_cache)
+            elif job.kind == "whatif":
+                job._on_progress("whatif", "🧪 正在重新计算精英化后的当前练度方案...", 0)
+                job.result = what_if(operators, changes or {}, config, game_data, cache=self.cache,
+                                     scan_cache=self.scan_cache)
+            else:
+                result = run_pipeline(operators, config, game_data, progress=job._on_progress,
+                                      cache=self.cache, budget=SEARCH_BUDGET, on_improve=job._on_improve,
+                                      restarts=restarts, store=self.store, previous=previous)
+                self.results.put(result["key"], {"curr": result["curr"], "pot": result["pot"], "txt": result["txt"]})
+                job.result = {k: v for k, v in result.items() if k not in ("curr", "pot", "txt")}
+                job.result["shifts"] = len(result["curr"].get("plans") or [])
+            job.state = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.traceback = traceback.format_exc()
+            job.state = "error"
+        finally:
+            job.finished_at = time.time()
+            job._done.set()
+
+    def _purge(self):
+        # 清理超过保留时间的已结束任务
+        now = time.time()
+        expired = [k for k, j in self._jobs.items() if j.finished and now - j.finished_at > JOB_RETENTION]
+        for k in expired:
+            del self._jobs[k]
+        self._inflight = {key: job_id for key, job_id in self._inflight.items() if job_id in self._jobs
+                          and not self._jobs[job_id].finished}
@@ -0,0 +1,101 @@
+# ==========================================
+# 基建布局预设与配置构建
+# ==========================================
+# app.py 与批处理工具共用的布局定义，生成 WorkplaceOptimizer 所需的 current_config。
+
+# 预设 (均为 3 发电站)：贸易/制造站数量 + 默认产物分配
+#   lmd: 生产龙门币的贸易站数量 (其余为合成玉)
+#   gold / record / shard: 制造站中赤金 / 经验书 / 源石碎片的数量
+LAYOUT_PRESETS = {
+    # 2贸易 4制造 -> 2赤金 2经验 | 全龙门币
+    "2-4-3": {"trading": 2, "manufacture": 4, "lmd": 2, "gold": 2, "record": 2, "shard": 0},
+    # 3贸易 3制造 -> 2赤金 0经验 1碎片 | 2龙门币 1合成玉
+    "3-3-3": {"trading": 3, "manufacture": 3, "lmd": 2, "gold": 2, "record": 0, "shard": 1},
+    # 1贸易 5制造 -> 2赤金 3经验 | 全龙门币
+    "1-5-3": {"trading": 1, "manufacture": 5, "lmd": 1, "gold": 2, "record": 3, "shard": 0},
+}
+
+# 无人机默认加速目标 (每个班次一个)
+DEFAULT_DRONE_TARGETS = ["LMD", "Pure Gold", "LMD"]
+
+
+def build_config(n_trading, n_manufacture, lmd, gold, record, shard,
+                 enable_fia=True, enable_drone=True, drone_targets=None, drone_order="pre"):
+    if drone_targets is None:
+        drone_targets = list(DEFAULT_DRONE_TARGETS) if enable_drone else []
+    return {
+        "product_requirements": {
+            "trading_stations": {"LMD": lmd, "Orundum": n_trading - lmd},
+            "manufacturing_stations": {"Pure Gold": gold, "Originium Shard": shard, "Battle Record": record}
+        },
+        "trading_stations_count": n_trading,
+        "manufacturing_stations_count": n_manufacture,
+        "Fiammetta": {"enable": enable_fia},
+        "drones": {"enable": enable_drone, "order": drone_order, "targets": drone_targets}
+    }
+
+
+def preset_config(name, **kwargs):
+    # 按预设名称 ("2-4-3" 等) 生成完整配置，kwargs 透传菲亚梅塔/无人机设置
+    p = LAYOUT_PRESETS[name]
+    return build_config(p["trading"], p["manufacture"], p["lmd"], p["gold"], p["record"], p["shard"], **kwargs)
+
+
+def enumerate_layouts(total=6, drone_targets=None, enable_fia=True, enable_drone=True):
+    # 枚举全部 3 发电站布局：贸易/制造站数量 × 贸易站龙门币/合成玉分配 × 制造站产物分配
+    layouts = []
+    for n_trading in range(total, -1, -1):
+        n_manufacture = total - n_trading
+        for lmd in range(n_trading, -1, -1):
+            for gold in range(n_manufacture, -1, -1):
+                for record in range(n_manufacture - gold, -1, -1):
+                    shard = n_manufacture - gold - record
+                    layouts.append({
+                        "label": f"{n_trading}-{n_manufacture}-3 · {lmd}币{n_trading - lmd}玉 · "
+                                 f"{gold}金{record}书{shard}碎",
+                        "trading": n_trading, "manufacture": n_manufacture,
+                        "lmd": lmd, "gold": gold, "record": record, "shard": shard,
+                        "config": build_config(n_trading, n_manufacture, lmd, gold, record, shard,
+                                               enable_fia=enable_fia, enable_drone=enable_drone,
+                                               drone_targets=drone_targets),
+                    })
+    return layouts
+
+
+TRADING_PRODUCTS = ("LMD", "Orundum")
+MANUFACTURING_PRODUCTS = ("Pure Gold", "Originium Shard", "Battle Record")
+
+
+def validate_config(config):
+    # 校验外部传入的 current_config (与界面上的限制一致)：贸易/制造站各 0–6 间且总数不超过 9，
+    # 产物分配为非负整数且与站点数量相符；格式不符时抛出 ValueError
+    if not isinstance(config, dict):
+        raise ValueError("config 应为 current_config 格式的对象")
+    try:
+        n_trading = config["trading_stations_count"]
+        n_manufacture = config["manufacturing_stations_count"]
+        requirements = config["product_requirements"]
+        trading = requirements["trading_stations"]
+        manufacturing = requirements["manufacturing_stations"]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"config 缺少字段: {e}") from e
+    for name, value in (("trading_stations_count", n_trading), ("manufacturing_stations_count", n_manufacture)):
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 6:
+            raise ValueError(f"{name} 应为 0–6 的整数")
+    if n_trading + n_manufacture > 9:
+        raise ValueError("贸易站与制造站总数不能超过 9")
+    for label, counts, products, total in (("trading_stations", trading, TRADING_PRODUCTS, n_trading),
+                                           ("manufacturing_stations", manufacturing, MANUFACTURING_PRODUCTS,
+                                            n_manufacture)):
+        if not isinstance(counts, dict):
+            raise ValueError(f"product_requirements.{label} 应为 {{产物: 数量}} 对象")
+        for product, count in counts.items():
+            if product not in products:
+                raise ValueError(f"product_requirements.{label} 中的未知产物: {product}")
+            if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+                raise ValueError(f"product_requirements.{label}.{product} 应为非负整数")
+        if sum(counts.values()) != total:
+            raise ValueError(f"product_requirements.{label} 的数量之和应为 {total}")
+    for key in ("Fiammetta", "drones"):
+        if key in config and not isinstance(config[key], dict):
+            raise ValueError(f"{key} 应为对象")
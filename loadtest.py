@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import pickle
+import platform
+import sys
+import threading
+import time
+
+from bench import make_roster, peak_rss_mb
+
+# ==========================================
+# 多会话压力测试
+# ==========================================
+# 用 Streamlit AppTest 在同一进程内模拟 N 个并发会话：每个会话粘贴合成干员表、切换布局预设、
+# 点击「生成排班方案」并等待结果，记录端到端耗时。并发数逐级递增，每级输出吞吐量、
+# p50/p95/p99 延迟、内存 (主进程 + 搜索子进程的峰值与每会话增量)、会话状态大小与错误率，写入 JSON 报告。
+# 所有会话共用进程级的缓存、任务队列与搜索进程池，与真实服务端一致。
+# AppTest 每次运行都会替换进程内的全局 Runtime，脚本的单次执行因此需要串行 (_RUN_LOCK)；
+# 排班计算本身在任务线程 / 搜索进程池中并发进行，测得的延迟包含排队等待脚本执行的时间，
+# 但测不到多个脚本线程同时执行时的争用 (报告 meta 中的 script_runs_serialized 标明这一点)。
+# 正式测量前先跑一个丢弃结果的会话，app.py / Streamlit 的一次性导入与初始化开销不计入首级。
+# 指定 --baseline 时与历史报告比较，超出阈值即以非零状态退出，可用于 app.py / logic 升级把关。
+#
+# 用法示例:
+#   python loadtest.py --levels 1 2 4 8 --iterations 3 -o loadtest_output.json
+#   python loadtest.py --baseline old.json --max-p95-growth 1.3
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PRESET_LABELS = ["2-4-3 (均衡)", "3-3-3 (搓玉推荐)", "1-5-3 (极限制造)"]
+_RUN_LOCK = threading.Lock()
+
+
+def _statm_mb(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _child_pids(pid):
+    # 直接子进程 (各线程的 children 列表之和)
+    children = set()
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.update(int(c) for c in f.read().split())
+        except OSError:
+            continue
+    return children
+
+
+def current_rss_mb():
+    # 当前常驻内存 (Linux 读取 /proc)：(主进程, 全部子孙进程之和)，其中包括搜索进程池的工作进程；
+    # 其他平台退回主进程峰值、子进程记为 None
+    try:
+        main = _statm_mb(os.getpid())
+    except (OSError, ValueError):
+        return peak_rss_mb(), None
+    children = 0.0
+    pending = list(_child_pids(os.getpid()))
+    while pending:
+        pid = pending.pop()
+        try:
+            children += _statm_mb(pid)
+            pending.extend(_child_pids(pid))
+        except (OSError, ValueError):
+            continue  # 采样期间已退出
+    return main, children
+
+
+def session_state_kb(at):
+    # 会话状态的序列化大小：无法序列化的条目跳过
+    total = 0
+    for key in at.session_state.filtered_state:
+        try:
+            total += len(pickle.dumps(at.session_state[key]))
+        except Exception:
+            continue
+    return total / 1024
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = (len(values) - 1) * q
+    low = int(index)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (index - low)
+
+
+def _run(at):
+    with _RUN_LOCK:
+        at.run()
+
+
+def _button(at, text):
+    return next(b for b in at.button if text in b.label)
+
+
+def run_session(user, level, args, records, iterations=None):
+    # 单个虚拟用户：顺序完成 iterations 次「导入 -> 选预设 -> 生成 -> 等待结果」
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    _run(at)
+    state_kb = None
+    for i in range(args.iterations if iterations is None else iterations):
+        # 默认每次使用不同的干员表 (不命中缓存)；--repeat 时每个用户反复提交同一份
+        seed = args.seed + user if args.repeat else args.seed + (level * 1000 + user) * 1000 + i
+        record = {"level": level, "user": user, "iteration": i, "error": None}
+        started = time.perf_counter()
+        try:
+            if at.session_state.pasted_roster is not None:
+                _button(at, "清除重置").click()
+                _run(at)
+            at.text_area[0].input(json.dumps(make_roster(args.size, seed), ensure_ascii=False))
+            _run(at)
+            next(r for r in at.radio if "快速预设" in r.label).set_value(PRESET_LABELS[(user + i) % 3])
+            _run(at)
+            _button(at, "生成排班方案").click()
+            _run(at)
+            deadline = time.perf_counter() + args.timeout
+            while at.session_state.job_id is not None:
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"{args.timeout}s 内未完成")
+                time.sleep(args.poll)
+                _run(at)
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            if not at.session_state.calculated:
+                raise RuntimeError("未生成结果")
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["latency"] = time.perf_counter() - started
+        records.append(record)
+    try:
+        state_kb = session_state_kb(at)
+    except Exception:
+        pass
+    return state_kb
+
+
+def warm_up_session(args):
+    # 丢弃结果的预热会话 (level 0 的种子不与正式测量重复)：完成 app.py 首次执行与一次完整提交
+    records = []
+    run_session(0, 0, args, records, iterations=1)
+    return records[0]
+
+
+def run_level(level, args):
+    records = []
+    state_sizes = []
+    main_before, children_before = current_rss_mb()
+    rss_before = main_before + (children_before or 0)
+    peak = [rss_before, main_before, children_before]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.2):
+            main, children = current_rss_mb()
+            peak[0] = max(peak[0], main + (children or 0))
+            peak[1] = max(peak[1], main)
+            if children is not None:
+                peak[2] = max(peak[2] or 0, children)
+
+    def user_thread(user):
+        size = run_session(user, level, args, records)
+        if size is not None:
+            state_sizes.append(size)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user_thread, args=(u,), name=f"load-{level}-{u}") for u in range(level)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+
+    ok = [r["latency"] for r in records if not r["error"]]
+    errors = [r for r in records if r["error"]]
+    return {
+        "concurrency": level,
+        "requests": len(records),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(records) if records else 0.0,
+        "duration": duration,
+        "throughput": len(ok) / duration if duration else 0.0,
+        "latency": {
+            "mean": sum(ok) / len(ok) if ok else None,
+            "p50": percentile(ok, 0.50),
+            "p95": percentile(ok, 0.95),
+            "p99": percentile(ok, 0.99),
+            "max": max(ok) if ok else None,
+        },
+        # 内存为主进程与全部子进程 (搜索进程池) 常驻内存之和，另分别给出两者的峰值
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": peak[0],
+        "rss_main_peak_mb": peak[1],
+        "rss_children_peak_mb": peak[2],
+        "rss_per_session_mb": (peak[0] - rss_before) / level,
+        "session_state_kb": sum(state_sizes) / len(state_sizes) if state_sizes else None,
+        "error_samples": sorted({r["error"] for r in errors})[:5],
+    }
+
+
+def compare(results, baseline, max_p95_growth, max_throughput_drop, max_error_rate):
+    # 按并发级别与基线报告比较，返回超出阈值的问题列表
+    base = {level["concurrency"]: level for level in baseline["levels"]}
+    problems = []
+    for level in results["levels"]:
+        n = level["concurrency"]
+        if level["error_rate"] > max_error_rate:
+            problems.append(f"并发 {n}: 错误率 {level['error_rate']:.1%}")
+        old = base.get(n)
+        if old is None:
+            continue
+        p95, old_p95 = level["latency"]["p95"], old["latency"]["p95"]
+        if p95 and old_p95 and p95 > old_p95 * max_p95_growth:
+            problems.append(f"并发 {n}: p95 {old_p95:.3f}s -> {p95:.3f}s")
+        if old["throughput"] and level["throughput"] < old["throughput"] * (1 - max_throughput_drop):
+            problems.append(f"并发 {n}: 吞吐量 {old['throughput']:.2f}/s -> {level['throughput']:.2f}/s")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="排班界面多会话压力测试")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8], help="逐级递增的并发会话数")
+    parser.add_argument("--iterations", type=int, default=3, help="每个会话的提交次数")
+    parser.add_argument("--size", type=int, default=200, help="合成干员表规模")
+    parser.add_argument("--seed", type=int, default=0, help="合成干员表随机种子")
+    parser.add_argument("--repeat", action="store_true", help="每个会话反复提交同一份干员表 (测量缓存命中路径)")
+    parser.add_argument("--timeout", type=float, default=300, help="单次提交的超时 (秒)")
+    parser.add_argument("--poll", type=float, default=0.2, help="等待结果时的轮询间隔 (秒)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="跳过预热 (进程池启动与预热会话)，把冷启动计入首级")
+    parser.add_argument("-o", "--output", default="loadtest_output.json", help="报告文件")
+    parser.add_argument("--baseline", help="用于回归比较的历史报告")
+    parser.add_argument("--max-p95-growth", type=float, default=1.25, help="各级 p95 延迟允许的最大倍数")
+    parser.add_argument("--max-throughput-drop", type=float, default=0.2, help="各级吞吐量允许的最大下降比例")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="允许的最大错误率")
+    args = parser.parse_args(argv)
+
+    # 默认不读写磁盘结果存储，避免重复运行时命中上一次的结果而测不到计算本身
+    os.environ.setdefault("MAA_STORE_PATH", "")
+
+    from gamedata import LOGIC_VERSION, get_game_data
+    from serve import warm_up
+    import streamlit.testing.v1  # AppTest 的导入开销同样不计入首级
+
+    # 先导入 logic、拉起搜索进程池，再跑一个丢弃结果的会话，首级的内存与延迟不计入冷启动开销
+    warmup = None
+    if not args.no_warmup:
+        warm_up()
+        warmup = warm_up_session(args)
+        if warmup["error"]:
+            print(f"⚠️ 预热会话失败: {warmup['error']}", file=sys.stderr)
+
+    started = time.time()
+    levels = []
+    for level in args.levels:
+        summary = run_level(level, args)
+        levels.append(summary)
+        lat = summary["latency"]
+        print(f"并发 {level}: {summary['requests']} 次，错误 {summary['errors']}，"
+              f"吞吐 {summary['throughput']:.2f}/s，p50 {lat['p50'] or 0:.2f}s，p95 {lat['p95'] or 0:.2f}s",
+              file=sys.stderr)
+
+    results = {
+        "meta": {
+            "logic_version": LOGIC_VERSION,
+            "game_data_version": get_game_data().version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "size": args.size,
+            "iterations": args.iterations,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "warmup": not args.no_warmup,
+            "warmup_latency": warmup["latency"] if warmup else None,
+            "script_runs_serialized": True,
+            "notes": ["AppTest 每次运行替换进程内的全局 Runtime，脚本执行经进程级锁串行：延迟包含等待该锁的时间，"
+                      "未测量多个脚本线程同时执行时的争用",
+                      "rss_* 为主进程与全部子进程 (搜索进程池) 常驻内存之和"],
+            "started_at": started,
+            "duration": time.time() - started,
+        },
+        "levels": levels,
+    }
+    with open(args.output, "w", encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入 {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.max_p95_growth, args.max_throughput_drop, args.max_error_rate)
+        for line in problems:
+            print(f"⚠️ 回归: {line}", file=sys.stderr)
+        if problems:
+            return 1
+    return 1 if any(level["errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# 运行指标：分阶段耗时 / 计数器 / Prometheus 导出
+# ==========================================
+# 每次排班计算结束后记录各阶段耗时与计数，聚合为计数器和直方图；
+# 同时输出一行结构化 (JSON) 日志。设置 MAA_METRICS_PORT 后，
+# 在本机该端口的 /metrics 以 Prometheus 文本格式提供聚合指标，/ready 提供就绪检查。
+
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+logger = logging.getLogger("maa.metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels)) + "}"
+
+
+class Registry:
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, help=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help:
+                self._help[name] = help
+
+    def observe(self, name, value, help=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+            if help:
+                self._help[name] = help
+
+    def snapshot(self):
+        # 供调试面板展示：{指标名{标签}: 值}，直方图给出次数与平均值
+        with self._lock:
+            data = {f"{n}{_label_str(l)}": v for (n, l), v in self._counters.items()}
+            for (n, l), h in self._histograms.items():
+                data[f"{n}{_label_str(l)}"] = {"count": h["count"], "avg": h["sum"] / h["count"] if h["count"] else 0}
+        return data
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    seen.add(name)
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_label_str(labels)} {value}")
+            for (name, labels), hist in sorted(self._histograms.items()):
+                if name not in seen:
+                    seen.add(name)
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                for bound, count in zip(BUCKETS, hist["buckets"]):
+                    lines.append(f"{name}_bucket{_label_str(labels + (('le', bound),))} {count}")
+                lines.append(f"{name}_bucket{_label_str(labels + (('le', '+Inf'),))} {hist['count']}")
+                lines.append(f"{name}_sum{_label_str(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{_label_str(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def record_phase(phase, seconds):
+    REGISTRY.observe("maa_phase_seconds", seconds, help="各阶段耗时 (秒)", phase=phase)
+
+
+def record_run(timings, counters, elapsed, cached, source="pipeline"):
+    # 一次完整排班计算：写入聚合指标，并输出一行结构化日志
+    for phase, seconds in timings.items():
+        record_phase(phase, seconds)
+    REGISTRY.observe("maa_run_seconds", elapsed, help="单次排班计算总耗时 (秒)", cached=str(bool(cached)).lower())
+    REGISTRY.inc("maa_runs_total", help="排班计算次数", cached=str(bool(cached)).lower())
+    for name, value in counters.items():
+        REGISTRY.inc(f"maa_{name}_total", value)
+    logger.info(json.dumps({
+        "event": "schedule_run",
+        "source": source,
+        "elapsed": round(elapsed, 4),
+        "cached": bool(cached),
+        "timings": {k: round(v, 4) for k, v in timings.items()},
+        "counters": counters,
+    }, ensure_ascii=False))
+
+
+# ==========================================
+# 就绪状态
+# ==========================================
+# 由启动脚本 (serve.py) 在预热完成后标记；/ready 在此之前返回 503，供本机健康探针查询。
+
+_ready = threading.Event()
+_ready_info = {}
+
+
+def set_ready(**info):
+    _ready_info.update(info)
+    _ready.set()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+# ==========================================
+# 本机指标端点
+# ==========================================
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._reply(200, REGISTRY.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/ready":
+            body = json.dumps(dict(_ready_info, ready=is_ready()), ensure_ascii=False)
+            self._reply(200 if is_ready() else 503, body, "application/json; charset=utf-8")
+        else:
+            self.send_error(404)
+
+    def _reply(self, status, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 抓取请求不写访问日志
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    # 在后台线程启动指标端点；未配置端口时不启动。重复调用只启动一次。
+    global _server
+    port = port or int(os.environ.get("MAA_METRICS_PORT", 0))
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+            threading.Thread(target=_server.serve_forever, name="maa-metrics", daemon=True).start()
+    return _server
+
+
+class timer:
+    # with timer("parse"): ... —— 记录一个阶段的耗时
+    def __init__(self, phase):
+        self.phase = phase
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        record_phase(self.phase, self.seconds)
+        return False
@@ -0,0 +1,841 @@
+import copy
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from logic import WorkplaceOptimizer
+
+import metrics
+from cache import canonical_hash
+from gamedata import get_game_data
+from layouts import enumerate_layouts
+from roster import Roster
+
+# ==========================================
+# 排班计算流水线
+# ==========================================
+# 把 app.py 中按钮回调里的计算步骤抽出来，按真实阶段上报进度，
+# 供 Streamlit 界面 (st.progress / st.status) 或其他调用方订阅。
+
+# 阶段定义: (阶段标识, 提示文案)
+PHASES = [
+    ("load", "📥 读取干员练度数据..."),
+    ("init", "🧠 加载 WorkplaceOptimizer 核心算法..."),
+    ("curr", "📊 正在演算当前练度最优解 (Monte Carlo / Greedy)..."),
+    ("pot", "🔮 正在推演理论极限模型..."),
+    ("upgrade", "📈 生成练度提升路径分析报告..."),
+]
+
+# 各阶段的耗时估计 (秒)，用于把进度条百分比映射到真实工作量。
+# 初始值只是粗略比例，每次运行后用实际耗时做滑动平均修正。
+_phase_cost = {"load": 0.01, "init": 0.05, "curr": 1.0, "pot": 1.0, "upgrade": 0.05}
+_EMA_ALPHA = 0.3
+
+
+def clean(d):
+    # 去掉不可序列化的原始结果对象
+    return {k: v for k, v in d.items() if k != 'raw_results'}
+
+
+def first_efficiency(plan):
+    return plan['raw_results'][0].total_efficiency if plan['raw_results'] else 0
+
+
+def plan_operators(plan):
+    # 方案中出现过的全部干员名称 (所有班次、所有房间)
+    names = set()
+    for shift in plan.get("plans") or []:
+        for entries in (shift.get("rooms") or {}).values():
+            for entry in entries or []:
+                names.update(entry.get("operators") or [])
+    return names
+
+
+class _Progress:
+    # 进度上报器：回调签名为 callback(phase, label, percent)
+    # 支持多个阶段同时进行 (curr / pot 并行搜索)
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.total = sum(_phase_cost.values())
+        self.done = 0.0
+        self.timings = {}
+        self._phase = None
+        self._started = {}
+
+    def start(self, phase, label):
+        self._phase = phase
+        self._started[phase] = time.perf_counter()
+        self._emit(phase, label)
+
+    def skip(self, phase=None):
+        # 阶段结果来自缓存：推进进度，但不计入耗时统计
+        self.done += _phase_cost[phase or self._phase]
+
+    def finish(self, phase=None):
+        phase = phase or self._phase
+        self.timings[phase] = time.perf_counter() - self._started[phase]
+        self.done += _phase_cost[phase]
+
+    def complete(self):
+        # 用本次实测耗时修正下一次的进度权重
+        for phase, elapsed in self.timings.items():
+            if phase not in _phase_cost:
+                continue
+            _phase_cost[phase] = (1 - _EMA_ALPHA) * _phase_cost[phase] + _EMA_ALPHA * elapsed
+        self._emit("done", "✅ 计算完成", 100)
+
+    def _emit(self, phase, label, percent=None):
+        if self.callback is None:
+            return
+        if percent is None:
+            percent = int(100 * self.done / self.total) if self.total else 0
+        self.callback(phase, label, min(percent, 100))
+
+
+def load_operators(operators):
+    # 统一入口：接受 Roster、已解析的干员列表，或 MAA 导出的原始 JSON 文本/字节
+    if isinstance(operators, Roster):
+        return operators.to_list()
+    if isinstance(operators, (bytes, bytearray)):
+        operators = operators.decode('utf-8')
+    if isinstance(operators, str):
+        operators = json.loads(operators)
+    return operators
+
+
+def build_optimizer(operators, config, game_data=None):
+    # 以内存中的干员列表与配置字典构造优化器；基础数据统一引用进程级的 GameData。
+    # logic 构建只接受文件路径：写入本次调用私有的临时目录，
+    # 避免多个会话共用 temp_ops.json / temp_conf.json 互相覆盖。
+    game_data = game_data or get_game_data()
+    operators = load_operators(operators)
+    with tempfile.TemporaryDirectory(prefix="maa_sched_") as tmp:
+        ops_path = os.path.join(tmp, "operators.json")
+        conf_path = os.path.join(tmp, "config.json")
+        with open(ops_path, "w", encoding='utf-8') as f:
+            json.dump(operators, f, ensure_ascii=False)
+        with open(conf_path, "w", encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        return WorkplaceOptimizer(game_data.path, ops_path, conf_path)
+
+
+# ==========================================
+# 多进程并行搜索
+# ==========================================
+# curr (ignore_elite=False) 与 pot (ignore_elite=True) 是同一份干员数据上的两次独立搜索，
+# 放到进程池中并行执行，总耗时接近较慢的一次而不是两者之和。
+
+_pool = None
+_pool_lock = multiprocessing.Lock()
+
+MAX_SEARCH_WORKERS = int(os.environ.get("MAA_SEARCH_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+
+# 单次排班的时间预算 (秒)，0 表示不限。例如共享服务器设为 2，批处理工具保持不限。
+# 搜索本身在编译后的 logic 中无法中途打断；预算到期后不再等待理论极限方案与提升建议，
+# 先返回当前练度方案，未完成的搜索在后台结束后写入缓存，下次请求即可拿到完整结果。
+SEARCH_BUDGET = float(os.environ.get("MAA_SEARCH_BUDGET", 0))
+
+
+# 结果对象无法跨进程传递时 (编译后的 logic 返回的原始结果可能不可序列化) 记录下来，
+# 之后的搜索直接在当前进程串行执行，不再每次先提交到进程池再失败
+_serial_only = False
+
+
+def _use_pool():
+    return MAX_SEARCH_WORKERS >= 2 and not _serial_only
+
+
+def _is_transfer_error(e):
+    # 参数 / 结果序列化失败：PicklingError，或 Python 3.11 起的 TypeError / AttributeError ("cannot pickle ...")
+    return isinstance(e, pickle.PicklingError) or (isinstance(e, (TypeError, AttributeError)) and "pickle" in str(e))
+
+
+def _disable_pool():
+    global _serial_only
+    _serial_only = True
+
+
+def get_process_pool():
+    # 进程级共享的搜索进程池，首次使用时创建
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 使用 spawn：Streamlit 进程中有多个线程，fork 不安全
+            _pool = ProcessPoolExecutor(max_workers=MAX_SEARCH_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# 工作进程内复用已初始化的优化器：构造 WorkplaceOptimizer 时要加载基础数据并展开
+# 干员技能效果，同一份干员表 + 配置的重复搜索 (多次重启、练度模拟基准、其他会话的相同请求)
+# 落到同一工作进程时不再重复初始化。按 LRU 保留最近几个。
+# 编译后的 logic 是否在两次 get_optimal_assignments 之间保留内部状态无法从外部确认，因此缓存键
+# 包含 ignore_elite：一个实例只会以同一个 ignore_elite 被重复调用，不会出现 pot 之后再算 curr
+# 之类原版从未有过的调用顺序。这里假设同一实例以相同参数重复调用时，前一次调用不影响后一次的结果。
+WORKER_OPTIMIZERS = 8  # 每份干员表 + 配置最多占两个 (curr / pot)
+_worker_optimizers = OrderedDict()
+
+
+def _worker_optimizer(operators, config, game_data, ignore_elite):
+    key = canonical_hash(game_data.version, operators, config, bool(ignore_elite))
+    optimizer = _worker_optimizers.get(key)
+    if optimizer is None:
+        optimizer = _worker_optimizers[key] = build_optimizer(operators, config, game_data)
+        while len(_worker_optimizers) > WORKER_OPTIMIZERS:
+            _worker_optimizers.popitem(last=False)
+    else:
+        _worker_optimizers.move_to_end(key)
+    return optimizer
+
+
+def _search_worker(operators, config, ignore_elite, game_data, seed=None):
+    # 子进程入口：在子进程内取得 (或构造) 优化器并执行一次搜索
+    optimizer = _worker_optimizer(operators, config, game_data, ignore_elite)
+    if seed is not None:
+        random.seed(seed)
+    return optimizer.get_optimal_assignments(ignore_elite=ignore_elite)
+
+
+def get_optimal_assignments_many(operators, config, flags=(False, True), game_data=None, on_done=None,
+                                 deadline=None, optional=(), on_late=None, get_optimizer=None):
+    # 并行执行多个 ignore_elite 变体，返回 {flag: 方案}
+    # on_done(flag, plan) 在每个变体完成时回调 (用于进度上报与中间结果推送)。
+    # 到达 deadline 后不再等待 optional 中的变体：它们不出现在返回值中，
+    # 之后在后台完成时以 on_late(flag, plan) 回调 (例如写入缓存)。
+    # get_optimizer: 调用方按需构造当前进程优化器的函数；不使用进程池时串行搜索用它，
+    # 调用方之后的提升分析可复用同一实例，不必再构造一次
+    game_data = game_data or get_game_data()
+    operators = load_operators(operators)
+    flags = [bool(f) for f in flags]
+    optional = {bool(f) for f in optional}
+    if len(flags) < 2 or not _use_pool():
+        return _search_serial(operators, config, flags, game_data, on_done, get_optimizer=get_optimizer,
+                              deadline=deadline, optional=optional)
+
+    results = {}
+    pending = {}
+    try:
+        pool = get_process_pool()
+        pending = {pool.submit(_search_worker, operators, config, flag, game_data): flag for flag in flags}
+        while pending:
+            # 还有必需的变体时一直等待；只剩可选变体时最多等到 deadline
+            timeout = None
+            if deadline is not None and optional.issuperset(pending.values()):
+                timeout = max(0.0, deadline - time.perf_counter())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                flag = pending.pop(future)
+                results[flag] = future.result()
+                if on_done is not None:
+                    on_done(flag, results[flag])
+        for future, flag in pending.items():
+            if on_late is not None:
+                future.add_done_callback(lambda f, flag=flag: _deliver_late(f, flag, on_late))
+        return results
+    except BrokenProcessPool:
+        _reset_process_pool()
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        if not _is_transfer_error(e):
+            raise
+        _disable_pool()
+    # 进程池异常或结果对象无法跨进程传递时，在当前进程串行补算尚未完成的变体
+    # (已完成的结果保留，不会对同一变体重复回调 on_done)
+    for future in pending:
+        future.cancel()
+    missing = [flag for flag in flags if flag not in results]
+    results.update(_search_serial(operators, config, missing, game_data, on_done, get_optimizer=get_optimizer,
+                                  deadline=deadline, optional=optional))
+    return results
+
+
+def _deliver_late(future, flag, on_late):
+    if not future.cancelled() and future.exception() is None:
+        on_late(flag, future.result())
+
+
+def _search_serial(operators, config, flags, game_data, on_done=None, get_optimizer=None, deadline=None,
+                   optional=()):
+    # 优化器在第一次实际搜索时才取得 (没有需要补算的变体时不构造)
+    optimizer = None
+    results = {}
+    for flag in flags:
+        if flag in optional and deadline is not None and time.perf_counter() >= deadline:
+            continue
+        if optimizer is None:
+            optimizer = get_optimizer() if get_optimizer is not None else build_optimizer(operators, config, game_data)
+        results[flag] = optimizer.get_optimal_assignments(ignore_elite=flag)
+        if on_done is not None:
+            on_done(flag, results[flag])
+    return results
+
+
+# ==========================================
+# 多次重启搜索
+# ==========================================
+# get_optimal_assignments 是随机化搜索 (Monte Carlo / Greedy)，不同运行的结果可能不同。
+# 房间级的打分在编译后的 logic 内部，无法在外部做分支定界；这里改为以不同随机种子
+# 独立重复搜索并取最优，同时给出各次结果的分布，作为结果稳定性的参考。
+# 种子通过 Python 的 random 传入，编译后的 logic 未必使用它：同一变体的两个不同种子给出
+# 完全相同的方案时，视为搜索与种子无关，不再执行该变体其余的重启 (最多多算一次)。
+# 与 iter_searches 一样，同时在途的任务不超过进程数，其他会话的搜索可以插队执行。
+
+RESTARTS = int(os.environ.get("MAA_RESTARTS", 1))
+MAX_RESTARTS = 8  # 界面滑块与接口允许的最大重启次数
+
+
+def _same_plan(a, b):
+    return first_efficiency(a) == first_efficiency(b) and clean(a) == clean(b)
+
+
+def search_restarts(operators, config, flags=(False, True), restarts=RESTARTS, game_data=None, deadline=None,
+                    optional=(), on_done=None):
+    # 每个 ignore_elite 变体以种子 0..restarts-1 各搜索一次，返回 {flag: [方案, ...]}。
+    # 到达 deadline 后，只要非 optional 的变体都至少有一个结果就不再等待其余重启。
+    game_data = game_data or get_game_data()
+    operators = load_operators(operators)
+    flags = [bool(f) for f in flags]
+    optional = {bool(f) for f in optional}
+    results = {flag: [] for flag in flags}
+    queue = [(seed, flag) for seed in range(restarts) for flag in flags]
+
+    def satisfied():
+        return all(results[flag] or flag in optional for flag in flags)
+
+    def expired():
+        return deadline is not None and time.perf_counter() >= deadline
+
+    def collect(flag, plan):
+        results[flag].append(plan)
+        if on_done is not None:
+            on_done(flag, plan)
+        if len(results[flag]) == 2 and _same_plan(*results[flag]):
+            queue[:] = [task for task in queue if task[1] != flag]
+
+    if _use_pool():
+        pool = get_process_pool()
+        in_flight = {}
+        try:
+            while queue or in_flight:
+                while queue and len(in_flight) < MAX_SEARCH_WORKERS and not (expired() and satisfied()):
+                    seed, flag = queue.pop(0)
+                    in_flight[pool.submit(_search_worker, operators, config, flag, game_data, seed)] = (seed, flag)
+                if not in_flight:
+                    break
+                timeout = None
+                if deadline is not None and satisfied():
+                    timeout = max(0.0, deadline - time.perf_counter())
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    task = in_flight.pop(future)
+                    try:
+                        plan = future.result()
+                    except Exception:
+                        queue.insert(0, task)
+                        raise
+                    collect(task[1], plan)
+            return results
+        except BrokenProcessPool:
+            _reset_process_pool()
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            if not _is_transfer_error(e):
+                raise
+            _disable_pool()
+        finally:
+            for future in in_flight:
+                future.cancel()
+        # 进程池不可用：只在当前进程补算尚未完成的重启，已有结果保留
+        queue[:0] = list(in_flight.values())
+
+    # 与工作进程内的复用规则一致：每个 ignore_elite 变体使用各自的实例，不在同一实例上交替调用
+    optimizers = {}
+    while queue and not (expired() and satisfied()):
+        seed, flag = queue.pop(0)
+        if flag not in optimizers:
+            optimizers[flag] = build_optimizer(operators, config, game_data)
+        random.seed(seed)
+        collect(flag, optimizers[flag].get_optimal_assignments(ignore_elite=flag))
+    return results
+
+
+def iter_searches(tasks, game_data=None, deadline=None):
+    # 批量执行 current-level 搜索：tasks 为 [(tag, operators, config)]，按完成顺序产出 (tag, 方案)；
+    # 单个任务失败时方案为 None。同时在途的任务不超过进程数，其他用户的任务可以插队执行；
+    # 到达 deadline (time.perf_counter 时刻) 后不再提交新任务并取消未开始的任务。
+    game_data = game_data or get_game_data()
+    queue = list(tasks)
+
+    def expired():
+        return deadline is not None and time.perf_counter() >= deadline
+
+    if _use_pool():
+        pool = get_process_pool()
+        in_flight = {}
+        try:
+            while (queue or in_flight) and not expired():
+                while queue and len(in_flight) < MAX_SEARCH_WORKERS:
+                    task = queue.pop(0)
+                    in_flight[pool.submit(_search_worker, task[1], task[2], False, game_data)] = task
+                timeout = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = in_flight.pop(future)
+                    try:
+                        plan = future.result()
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool) or _is_transfer_error(e):
+                            queue.insert(0, task)
+                            raise
+                        plan = None
+                    yield task[0], plan
+            return
+        except BrokenProcessPool:
+            _reset_process_pool()
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            if not _is_transfer_error(e):
+                raise
+            _disable_pool()
+        finally:
+            for future in in_flight:
+                future.cancel()
+        # 进程池不可用：尚未产出的任务改为在当前进程串行执行
+        queue = list(in_flight.values()) + queue
+
+    for tag, operators, config in queue:
+        if expired():
+            break
+        try:
+            plan = build_optimizer(operators, config, game_data).get_optimal_assignments(ignore_elite=False)
+        except Exception:
+            plan = None
+        yield tag, plan
+
+
+# ==========================================
+# 排班后处理：无人机 / 菲亚梅塔
+# ==========================================
+# 无人机目标与菲亚梅塔开关只影响方案中每个班次的附加字段，不影响房间分配。
+# 缓存键只使用搜索相关的配置 (站点数量、产物分配)，命中后按当前设置重新套用
+# 这两项，避免仅因切换无人机/菲亚梅塔而重新搜索。
+
+POST_ASSIGNMENT_KEYS = ("Fiammetta", "drones")
+
+# 无人机加速目标产物 -> 所在房间类型
+DRONE_ROOMS = {"LMD": "trading", "Orundum": "trading", "Pure Gold": "manufacture", "Battle Record": "manufacture"}
+
+
+def split_config(config):
+    # 拆分为 (搜索配置, 后处理配置)
+    search = {k: v for k, v in config.items() if k not in POST_ASSIGNMENT_KEYS}
+    post = {k: config[k] for k in POST_ASSIGNMENT_KEYS if k in config}
+    return search, post
+
+
+def can_rescore(plan, post):
+    # 方案结构可识别，且 (需要开启菲亚梅塔时) 每个班次都已有充能目标
+    shifts = plan.get("plans")
+    if not isinstance(shifts, list) or not shifts:
+        return False
+    for shift in shifts:
+        if not isinstance(shift, dict) or not isinstance(shift.get("rooms"), dict):
+            return False
+        if post.get("Fiammetta", {}).get("enable") and not (shift.get("Fiammetta") or {}).get("target"):
+            return False
+    return True
+
+
+def _drone_slot(rooms, product):
+    room = DRONE_ROOMS.get(product)
+    for index, entry in enumerate(rooms.get(room) or []):
+        if isinstance(entry, dict) and entry.get("product") == product:
+            return room, index + 1
+    return None
+
+
+def apply_post_settings(plan, post):
+    # 在不改动房间分配的前提下，按当前设置重写每个班次的无人机与菲亚梅塔字段
+    if not post or not can_rescore(plan, post):
+        return plan
+    plan = dict(plan)
+    plan["plans"] = shifts = [copy.copy(shift) for shift in plan["plans"]]
+    fia = post.get("Fiammetta")
+    drones = post.get("drones")
+    for i, shift in enumerate(shifts):
+        if fia is not None and isinstance(shift.get("Fiammetta"), dict):
+            shift["Fiammetta"] = dict(shift["Fiammetta"], enable=bool(fia.get("enable")))
+        if drones is not None:
+            entry = dict(shift.get("drones") or {})
+            targets = drones.get("targets") or []
+            slot = _drone_slot(shift["rooms"], targets[i % len(targets)]) if targets else None
+            entry["enable"] = bool(drones.get("enable")) and slot is not None
+            if slot is not None:
+                entry["room"], entry["index"] = slot
+            entry["order"] = drones.get("order", entry.get("order", "pre"))
+            shift["drones"] = entry
+    return plan
+
+
+def plan_key(digest, config, ignore_elite, game_data=None):
+    # get_optimal_assignments 结果的缓存键：干员数据哈希 + 配置 + ignore_elite + 基础数据版本戳
+    game_data = game_data or get_game_data()
+    return canonical_hash(game_data.version, digest, config, bool(ignore_elite))
+
+
+def report_key(digest, config, game_data=None):
+    game_data = game_data or get_game_data()
+    return canonical_hash(game_data.version, digest, config, "report")
+
+
+def result_key(digest, config, game_data=None, restarts=1):
+    # 一次完整排班结果的键 (会话中的结果句柄、持久化存储)：干员数据 + 完整配置 + 版本戳
+    game_data = game_data or get_game_data()
+    return canonical_hash(game_data.version, digest, dict(config, restarts=restarts) if restarts > 1 else config)
+
+
+def reusable(diff, curr, pot):
+    # 重新导入的干员表能否直接沿用上一次的方案：只有被移除或练度下降的干员，且它们既不在当前方案
+    # 也不在理论极限方案中。任何新增或练度提升都视为相关：提升后的干员可能顶替当前方案中
+    # 由练度不足者占据的位置，等级变化也可能改变理论极限方案本身。
+    if diff["added"] or diff["upgraded"]:
+        return False
+    used = plan_operators(curr) | plan_operators(pot)
+    return not any(op.name in used for op in diff["changed"] + diff["removed"])
+
+
+def run_pipeline(operators, config, game_data=None, progress=None, cache=None, budget=None, on_improve=None,
+                 restarts=1, store=None, previous=None):
+    # 完整执行一次排班计算，返回 curr / pot 方案、提升建议文本与首班效率
+    # operators 可以是 Roster、解析好的干员列表，也可以是原始 JSON 字节
+    # 传入 cache (ResultCache) 时先查缓存；全部命中则不会构造优化器
+    # budget (秒) 到期后只保证返回当前练度方案，pot / txt 可能为 None (partial)；
+    # on_improve({"efficiency", "bound"}) 在得到当前方案与理论上界时推送
+    # restarts > 1 时每个方案以不同种子重复搜索并取最优 (见 search_restarts)
+    # 传入 store (持久化 ResultStore) 时在任何搜索之前先查询，完整结果计算后写回
+    # previous: 同一会话上一次的 {"roster", "config", "restarts", "curr", "pot", "txt"}；
+    # 重新导入后只是移除或降低了两个方案都未使用的干员时直接沿用 (见 reusable)
+    started = time.perf_counter()
+    deadline = started + budget if budget else None
+    tracker = _Progress(progress)
+    labels = dict(PHASES)
+    game_data = game_data or get_game_data()
+    optimizer = None
+    # 本次运行的计数器 (搜索内部的候选/剪枝计数位于编译后的 logic 中，无法在此获取)
+    counters = {"operators": 0, "pruned": 0, "searches": 0, "cache_hits": 0, "cache_misses": 0,
+                "budget_skips": 0, "store_hits": 0, "reused": 0, "roster_changes": 0}
+    best = {}
+
+    def improved(phase, plan):
+        # 推送中间结果：当前方案效率，以及理论极限方案给出的参考上界 (多次重启时只升不降)
+        name = "efficiency" if phase == "curr" else "bound"
+        best[name] = max(best.get(name, first_efficiency(plan)), first_efficiency(plan))
+        if on_improve is not None and "efficiency" in best:
+            on_improve({"efficiency": best["efficiency"], "bound": best.get("bound")})
+
+    def expired():
+        return deadline is not None and time.perf_counter() >= deadline
+
+    def lookup(key):
+        if cache is None:
+            return None
+        value = cache.get(key)
+        counters["cache_hits" if value is not None else "cache_misses"] += 1
+        return value
+
+    def remember(key, value):
+        if cache is not None:
+            cache.put(key, value)
+
+    tracker.start("load", labels["load"])
+    roster = operators if isinstance(operators, Roster) else Roster.from_list(load_operators(operators))
+    # 只把候选干员交给优化器；缓存键也基于候选集，未拥有干员的差异不影响命中
+    candidates = roster.candidates()
+    digest = candidates.digest
+    operators = candidates.to_list()
+    counters["operators"] = len(roster)
+    counters["pruned"] = roster.pruned
+    tracker.finish()
+
+    # 缓存键只取搜索相关配置；无人机/菲亚梅塔在结果上重新套用
+    search_config, post = split_config(config)
+    # 多次重启的结果单独缓存，避免被单次搜索的结果顶替
+    plan_config = dict(search_config, restarts=restarts) if restarts > 1 else search_config
+    keys = {
+        "curr": plan_key(digest, plan_config, False, game_data),
+        "pot": plan_key(digest, plan_config, True, game_data),
+        "report": report_key(digest, plan_config, game_data),
+    }
+    # 方案缓存值为 (方案, 计算时的后处理配置)；设置不同时需可重新套用才算命中
+    cached_plans = {}
+    for phase in ("curr", "pot"):
+        entry = lookup(keys[phase])
+        if entry is not None and (entry[1] == post or can_rescore(entry[0], post)):
+            cached_plans[phase] = entry
+    curr = cached_plans["curr"][0] if "curr" in cached_plans else None
+    pot = cached_plans["pot"][0] if "pot" in cached_plans else None
+    txt = lookup(keys["report"])
+
+    if previous is not None and (curr is None or pot is None or txt is None):
+        prev_search, prev_post = split_config(previous["config"])
+        if (prev_search == search_config and previous.get("restarts", 1) == restarts
+                and previous["pot"] is not None and previous["txt"] is not None
+                and (prev_post == post or can_rescore(previous["curr"], post))):
+            diff = roster.diff(previous["roster"])
+            counters["roster_changes"] = len(diff["added"]) + len(diff["removed"]) + len(diff["changed"])
+            if reusable(diff, previous["curr"], previous["pot"]):
+                # 沿用上一次的方案；只返回给本次调用方，不以新干员表的键写入共享缓存或持久化存储
+                counters["reused"] = 1
+                curr, pot, txt = previous["curr"], previous["pot"], previous["txt"]
+                cached_plans = {"curr": (curr, prev_post), "pot": (pot, prev_post)}
+
+    full_key = result_key(digest, config, game_data, restarts)
+    stored = None
+    if store is not None and (curr is None or pot is None or txt is None):
+        # 内存缓存不完整时查询持久化存储；命中后只回填提升建议文本。恢复的方案中 raw_results
+        # 只是 StoredResult 占位，不能写入方案缓存：否则之后以其他无人机/菲亚梅塔设置命中时
+        # 会被当作真实方案交给优化器 (calculate_upgrade_requirements)
+        stored = store.get(full_key)
+        if stored is not None:
+            counters["store_hits"] += 1
+            curr, pot, txt = stored["curr"], stored["pot"], stored["txt"]
+            cached_plans = {"curr": (curr, post), "pot": (pot, post)}
+            remember(keys["report"], txt)
+
+    def get_optimizer():
+        # 只有在确实需要时才在当前进程构造优化器
+        nonlocal optimizer
+        if optimizer is None:
+            tracker.start("init", labels["init"])
+            optimizer = build_optimizer(operators, config, game_data)
+            tracker.finish()
+        return optimizer
+
+    computed = False
+    spread = {}
+    phase_of = {False: "curr", True: "pot"}
+    if restarts > 1 and (curr is None or pot is None):
+        # 多次重启：缺失的方案一起提交，每个方案取各次搜索中效率最高的一个
+        missing = [flag for flag, plan in ((False, curr), (True, pot)) if plan is None]
+        for flag in (False, True):
+            if flag in missing:
+                tracker.start(phase_of[flag], labels[phase_of[flag]])
+            else:
+                tracker.skip(phase_of[flag])
+        runs = search_restarts(operators, config, missing, restarts, game_data, deadline=deadline,
+                               optional=(True,), on_done=lambda flag, plan: improved(phase_of[flag], plan))
+        for flag, plans in runs.items():
+            phase = phase_of[flag]
+            counters["searches"] += len(plans)
+            if not plans:
+                tracker.skip(phase)
+                counters["budget_skips"] += 1
+                continue
+            tracker.finish(phase)
+            plan = max(plans, key=first_efficiency)
+            spread[phase] = sorted(first_efficiency(p) for p in plans)
+            remember(keys[phase], (plan, post))
+            if phase == "curr":
+                curr = plan
+            else:
+                pot = plan
+        for phase, (plan, _) in cached_plans.items():
+            improved(phase, plan)
+        computed = True
+    elif curr is None and pot is None:
+        # 两个方案都需要计算：在进程池中并行搜索
+        tracker.start("curr", labels["curr"])
+        tracker.start("pot", labels["pot"])
+
+        def on_done(flag, plan):
+            tracker.finish(phase_of[flag])
+            improved(phase_of[flag], plan)
+
+        # 理论极限方案可以晚到：预算到期后在后台完成并写入缓存
+        plans = get_optimal_assignments_many(operators, config, (False, True), game_data, on_done=on_done,
+                                             deadline=deadline, optional=(True,),
+                                             on_late=lambda flag, plan: remember(keys["pot"], (plan, post)),
+                                             get_optimizer=get_optimizer)
+        curr, pot = plans[False], plans.get(True)
+        remember(keys["curr"], (curr, post))
+        counters["searches"] += 1
+        if pot is not None:
+            remember(keys["pot"], (pot, post))
+            counters["searches"] += 1
+        else:
+            tracker.skip("pot")
+            counters["budget_skips"] += 1
+        computed = True
+    else:
+        for phase, flag in (("curr", False), ("pot", True)):
+            plan = curr if phase == "curr" else pot
+            if plan is None and phase == "pot" and expired():
+                tracker.start(phase, labels[phase])
+                tracker.skip()
+                counters["budget_skips"] += 1
+                continue
+            if plan is None:
+                opt = get_optimizer()
+                tracker.start(phase, labels[phase])
+                plan = opt.get_optimal_assignments(ignore_elite=flag)
+                remember(keys[phase], (plan, post))
+                tracker.finish()
+                counters["searches"] += 1
+                computed = True
+            else:
+                tracker.start(phase, labels[phase])
+                tracker.skip()
+            if phase == "curr":
+                curr = plan
+            else:
+                pot = plan
+            improved(phase, plan)
+
+    if txt is None and pot is None:
+        # 没有理论极限方案时无法生成提升建议
+        tracker.start("upgrade", labels["upgrade"])
+        tracker.skip()
+    elif txt is None:
+        opt = get_optimizer()
+        tracker.start("upgrade", labels["upgrade"])
+        upgrades = opt.calculate_upgrade_requirements(curr, pot)
+        suggest_started = time.perf_counter()
+        txt = opt.get_suggestions_text(upgrades)
+        remember(keys["report"], txt)
+        tracker.finish()
+        # 分别记录 calculate_upgrade_requirements 与 get_suggestions_text 的耗时
+        tracker.timings["suggestions"] = time.perf_counter() - suggest_started
+        tracker.timings["upgrade"] -= tracker.timings["suggestions"]
+        computed = True
+    else:
+        tracker.start("upgrade", labels["upgrade"])
+        tracker.skip()
+
+    if optimizer is None:
+        tracker.skip("init")
+    tracker.complete()
+
+    # 仅对以不同设置缓存的方案重新套用无人机/菲亚梅塔，新计算的方案保持原样
+    for phase, (plan, used) in cached_plans.items():
+        if used != post:
+            if phase == "curr":
+                curr = apply_post_settings(plan, post)
+            else:
+                pot = apply_post_settings(plan, post)
+
+    elapsed = time.perf_counter() - started
+    metrics.record_run(tracker.timings, counters, elapsed, not computed)
+    eff = first_efficiency(curr)
+    bound = first_efficiency(pot) if pot is not None else None
+    if store is not None and stored is None and not counters["reused"] and pot is not None and txt is not None:
+        store.put(full_key, game_data.version, clean(curr), clean(pot), txt, eff, bound)
+
+    return {
+        # 结果句柄：干员数据 + 完整配置 + 基础数据版本戳，内容相同的结果共用同一个键；
+        # 沿用的方案使用单独的句柄，不与该干员表真正计算出的结果混用
+        "key": canonical_hash(full_key, "reused") if counters["reused"] else full_key,
+        "curr": curr,
+        "pot": pot,
+        "txt": txt,
+        "eff": eff,
+        # 理论极限方案 (忽略精英化限制) 的效率作为参考上界，gap 为与当前方案的差距
+        "bound": bound,
+        "gap": bound - eff if bound is not None else None,
+        "partial": pot is None or txt is None,
+        # 多次重启时各方案每次搜索的效率 (升序)；单次搜索或命中缓存时为空
+        "spread": spread,
+        "timings": tracker.timings,
+        "counters": counters,
+        "elapsed": elapsed,
+        "cached": not computed,
+        "rescored": any(used != post for _, used in cached_plans.values()),
+    }
+
+
+# ==========================================
+# 全布局扫描
+# ==========================================
+# 对同一份干员表评估全部 3 发电站布局与产物分配 (共 210 种)，按当前练度总效率排名。
+# 干员表只预处理一次；各布局的搜索分批提交到共享进程池 (同时在途不超过进程数，
+# 不会长时间占满队列)，超出时间预算后停止提交并返回已完成部分。
+# 共享方案缓存 (cache) 只读：210 个布局方案不写入其中，以免挤掉其他用户的缓存条目；
+# 扫描得到的各布局总效率只以数值写入独立的 scan_cache。
+
+
+def sweep_layouts(operators, base_config=None, game_data=None, budget=None, cache=None, progress=None,
+                  on_improve=None, store=None, scan_cache=None):
+    # on_improve({"efficiency", "bound", "label"}) 在出现更优布局时推送
+    started = time.perf_counter()
+    deadline = started + budget if budget else None
+    game_data = game_data or get_game_data()
+    roster = operators if isinstance(operators, Roster) else Roster.from_list(load_operators(operators))
+    candidates = roster.candidates()
+    operators = candidates.to_list()
+    _, post = split_config(base_config or {})
+
+    layouts = enumerate_layouts()
+    rows = []
+    best = [0.0]
+    failed = 0
+    pending = []
+
+    def add_row(layout, plan, efficiency=None):
+        row = {k: layout[k] for k in ("label", "trading", "manufacture", "lmd", "gold", "record", "shard")}
+        row["total_efficiency"] = first_efficiency(plan) if efficiency is None else efficiency
+        if on_improve is not None and (not rows or row["total_efficiency"] > best[0]):
+            best[0] = row["total_efficiency"]
+            on_improve({"efficiency": row["total_efficiency"], "bound": None, "label": row["label"]})
+        rows.append(row)
+        if progress is not None:
+            progress("sweep", f"🧭 已评估 {len(rows)}/{len(layouts)} 种布局", int(100 * len(rows) / len(layouts)))
+
+    # 先用缓存与持久化存储中已有的结果
+    for layout in layouts:
+        config = dict(layout["config"], **post)
+        key = plan_key(candidates.digest, split_config(config)[0], False, game_data)
+        entry = cache.get(key) if cache is not None else None
+        stored = scan_cache.get(key) if entry is None and scan_cache is not None else None
+        if entry is None and stored is None and store is not None:
+            stored = store.efficiency(result_key(candidates.digest, config, game_data))
+        if entry is not None:
+            add_row(layout, entry[0])
+        elif stored is not None:
+            add_row(layout, None, stored)
+        else:
+            pending.append((layout, config, key))
+
+    tasks = [((layout, key), operators, config) for layout, config, key in pending]
+    for (layout, key), plan in iter_searches(tasks, game_data, deadline):
+        if plan is None:
+            failed += 1
+            continue
+        if scan_cache is not None:
+            scan_cache.put(key, first_efficiency(plan))
+        add_row(layout, plan)
+
+    rows.sort(key=lambda r: r["total_efficiency"], reverse=True)
+    return {
+        "rows": rows,
+        "evaluated": len(rows),
+        "failed": failed,
+        "total": len(layouts),
+        "complete": len(rows) + failed == len(layouts),
+        "elapsed": time.perf_counter() - started,
+    }
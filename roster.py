@@ -0,0 +1,119 @@
+import json
+
+from cache import canonical_hash
+
+# ==========================================
+# 干员练度表 (紧凑表示)
+# ==========================================
+# 导入时只解析一次 MAA「干员识别」导出，仅保留优化器需要的字段，
+# 以 __slots__ 对象保存并附带内容哈希。之后的界面刷新、校验、缓存键
+# 与优化器输入都复用同一个 Roster，不再重复 json.loads 原文。
+
+# 原始数据预览的最大长度 (字符)
+PREVIEW_CHARS = 3000
+
+
+class Operator:
+    __slots__ = ("id", "name", "elite", "level", "own", "potential", "rarity")
+
+    def __init__(self, id, name, elite, level, own, potential, rarity):
+        self.id = id
+        self.name = name
+        self.elite = elite
+        self.level = level
+        self.own = own
+        self.potential = potential
+        self.rarity = rarity
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            id=d["id"],
+            name=d.get("name", ""),
+            elite=int(d.get("elite", 0)),
+            level=int(d.get("level", 1)),
+            own=bool(d.get("own", True)),
+            potential=int(d.get("potential", 1)),
+            rarity=int(d.get("rarity", 0)),
+        )
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+def _dominates(a, b):
+    # 同一干员的两条记录：精英化阶段优先，其次等级
+    return (a.elite, a.level) > (b.elite, b.level)
+
+
+class Roster:
+    __slots__ = ("operators", "digest", "preview", "raw_size", "_candidates")
+
+    def __init__(self, operators, preview="", raw_size=0):
+        self.operators = tuple(operators)
+        self.digest = canonical_hash(self.to_list())
+        self.preview = preview
+        self.raw_size = raw_size
+        self._candidates = None
+
+    @classmethod
+    def from_list(cls, data):
+        return cls([Operator.from_dict(d) for d in data])
+
+    @classmethod
+    def parse(cls, raw):
+        # 解析 MAA 导出的 JSON 文本/字节；格式不符时抛出 ValueError
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode('utf-8')
+        data = json.loads(raw)
+        if not isinstance(data, list):
+            raise ValueError("干员数据应为 JSON 数组")
+        try:
+            operators = [Operator.from_dict(d) for d in data]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"干员条目格式无效: {e}") from e
+        return cls(operators, preview=raw[:PREVIEW_CHARS], raw_size=len(raw))
+
+    def candidates(self):
+        # 参与搜索的候选干员：剔除未拥有的干员；同一 ID 出现多次时只保留练度最高的一条。
+        # 被剔除的干员在任何房间都不可能优于保留者，搜索结果不受影响。
+        if self._candidates is None:
+            best = {}
+            for op in self.operators:
+                if not op.own:
+                    continue
+                prev = best.get(op.id)
+                if prev is None or _dominates(op, prev):
+                    best[op.id] = op
+            if len(best) == len(self.operators):
+                self._candidates = self
+            else:
+                self._candidates = Roster(best.values())
+        return self._candidates
+
+    def diff(self, previous):
+        # 与上一次导入的干员表比较 (按候选集的 id / 精英化 / 等级)；
+        # upgraded 为 changed 中精英化阶段或等级提升的干员
+        old = {op.id: op for op in previous.candidates()}
+        new = {op.id: op for op in self.candidates()}
+        changed = [op for i, op in new.items() if i in old and (op.elite, op.level) != (old[i].elite, old[i].level)]
+        return {
+            "added": [op for i, op in new.items() if i not in old],
+            "removed": [op for i, op in old.items() if i not in new],
+            "changed": changed,
+            "upgraded": [op for op in changed if _dominates(op, old[op.id])],
+        }
+
+    @property
+    def pruned(self):
+        return len(self.operators) - len(self.candidates())
+
+    def to_list(self):
+        # 优化器输入：MAA 导出格式的字典列表
+        return [op.to_dict() for op in self.operators]
+
+    def __len__(self):
+        return len(self.operators)
+
+    def __iter__(self):
+        return iter(self.operators)
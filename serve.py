@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+# ==========================================
+# 预热启动
+# ==========================================
+# 代替 `streamlit run app.py` 启动服务：在同一进程内先导入 logic、生成基础数据版本戳，
+# 并用一份小型合成干员表跑一次完整排班 (同时拉起搜索进程池)，之后才开始接受连接。
+# 新副本上的第一个用户因此不再承担冷启动开销。
+# 设置 --metrics-port (或 MAA_METRICS_PORT) 时，本机 /ready 在预热完成且服务开始监听前返回 503。
+#
+# 用法示例:
+#   python serve.py --port 8501 --metrics-port 9108
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def warm_up(size=30, seed=0):
+    # 返回各步骤耗时 (秒)
+    import metrics
+
+    timings = {}
+    started = time.perf_counter()
+    from pipeline import run_pipeline  # 导入 logic (WorkplaceOptimizer)
+    from gamedata import get_game_data
+    timings["import"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    game_data = get_game_data()
+    timings["game_data"] = time.perf_counter() - started
+
+    from bench import make_roster
+    from layouts import preset_config
+    from roster import Roster
+
+    started = time.perf_counter()
+    run_pipeline(Roster.from_list(make_roster(size, seed)), preset_config("2-4-3"), game_data)
+    timings["optimize"] = time.perf_counter() - started
+
+    metrics.logger.info(json.dumps({"event": "warm_up", "game_data": game_data.version,
+                                    "timings": {k: round(v, 4) for k, v in timings.items()}},
+                                   ensure_ascii=False))
+    return timings
+
+
+def _ready_when_listening(host, port, info):
+    # Streamlit 开始监听端口后才标记就绪，避免探针先于服务本身通过
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    import metrics
+    metrics.set_ready(**info)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预热后启动排班 Streamlit 服务")
+    parser.add_argument("--port", type=int, help="Streamlit 端口 (server.port)")
+    parser.add_argument("--address", help="Streamlit 监听地址 (server.address)")
+    parser.add_argument("--metrics-port", type=int, help="本机指标 / 就绪检查端口 (默认读取 MAA_METRICS_PORT)")
+    parser.add_argument("--warmup-size", type=int, default=30, help="预热用合成干员表的人数")
+    parser.add_argument("--no-warmup", action="store_true", help="跳过预热，直接启动")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port:
+        # app.py 中的 get_metrics_server 会复用同一个端点
+        os.environ["MAA_METRICS_PORT"] = str(args.metrics_port)
+
+    import metrics
+    metrics.start_metrics_server()
+
+    info = {"warm_up": None}
+    if not args.no_warmup:
+        try:
+            timings = warm_up(args.warmup_size)
+        except Exception as e:
+            print(f"预热失败: {type(e).__name__}: {e}", file=sys.stderr)
+            return 1
+        info["warm_up"] = {k: round(v, 4) for k, v in timings.items()}
+
+    from streamlit import config
+    from streamlit.web import bootstrap
+    flag_options = {"server_port": args.port, "server_address": args.address}
+    bootstrap.load_config_options(flag_options=flag_options)
+    host = config.get_option("server.address") or "127.0.0.1"
+    threading.Thread(target=_ready_when_listening, args=(host, config.get_option("server.port"), info),
+                     name="maa-ready", daemon=True).start()
+    bootstrap.run(APP_PATH, False, [], flag_options)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
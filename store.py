@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+# ==========================================
+# 持久化结果存储 (SQLite)
+# ==========================================
+# 以「干员数据 + 完整配置 + 基础数据版本戳」的哈希为键 (pipeline.result_key)，
+# 在本地 SQLite 文件中保存 clean(curr) / clean(pot)、提升建议与总效率，重启后仍可直接命中。
+#   - WAL 模式 + 忙等待超时：同一台机器上的多个服务进程 / 批处理进程可以并发读写；
+#   - 每个线程使用独立连接；
+#   - 按存活时间 (TTL) 与条目上限 (最久未访问优先) 淘汰。
+
+STORE_PATH = os.environ.get("MAA_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.db"))
+STORE_TTL = float(os.environ.get("MAA_STORE_TTL", 7 * 24 * 3600))
+STORE_MAX_ENTRIES = int(os.environ.get("MAA_STORE_MAX", 5000))
+_PURGE_EVERY = 50  # 每写入多少条执行一次淘汰
+
+# 从存储恢复的方案没有 logic 的原始结果对象，用它补上 raw_results 以便读取总效率
+StoredResult = namedtuple("StoredResult", ["total_efficiency"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    eff REAL NOT NULL,
+    bound REAL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+def _pack(record):
+    return zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode('utf-8'))
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def restore_plan(plan, efficiency):
+    # 给恢复出的方案补上 raw_results (只含总效率)
+    if plan is None:
+        return None
+    return dict(plan, raw_results=[StoredResult(efficiency)] if efficiency is not None else [])
+
+
+class ResultStore:
+
+    def __init__(self, path=STORE_PATH, ttl=STORE_TTL, max_entries=STORE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        # 返回 {"curr", "pot", "txt", "eff", "bound"}；方案已补上 raw_results
+        conn = self._connect()
+        row = conn.execute("SELECT created, eff, bound, payload FROM results WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl and now - row[0] > self.ttl:
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        created, eff, bound, payload = row
+        record = _unpack(payload)
+        return {
+            "curr": restore_plan(record["curr"], eff),
+            "pot": restore_plan(record["pot"], bound),
+            "txt": record["txt"],
+            "eff": eff,
+            "bound": bound,
+        }
+
+    def efficiency(self, key):
+        # 只读取总效率 (全布局扫描用)，不更新访问时间
+        row = self._connect().execute("SELECT created, eff FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and time.time() - row[0] > self.ttl):
+            return None
+        return row[1]
+
+    def put(self, key, version, curr, pot, txt, eff, bound):
+        # curr / pot 应为 clean() 之后可序列化的方案
+        now = time.time()
+        payload = _pack({"curr": curr, "pot": pot, "txt": txt})
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO results (key, version, created, accessed, eff, bound, payload) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", (key, version, now, now, eff, bound, payload))
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % _PURGE_EVERY == 0
+        if purge:
+            self.purge()
+
+    def purge(self):
+        # 删除过期条目；超过上限时删除最久未访问的条目
+        conn = self._connect()
+        with conn:
+            if self.ttl:
+                conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+            if self.max_entries:
+                conn.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed DESC "
+                             "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def stats(self):
+        size = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        with self._lock:
+            return {"size": size, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return self.stats()["size"]
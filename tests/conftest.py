@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import types
+
+# ==========================================
+# 测试环境
+# ==========================================
+# 编译后的 logic 不随仓库发布，测试统一使用一个确定性的替身：干员按「星级 + 精英化 + 等级」打分，
+# 依次填满各房间 (ignore_elite=True 时按全部精二满级打分)。
+# 搜索在当前进程内串行执行，不写持久化存储。
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["MAA_SEARCH_WORKERS"] = "1"
+os.environ["MAA_STORE_PATH"] = ""
+
+
+class _Result:
+
+    def __init__(self, total_efficiency):
+        self.total_efficiency = total_efficiency
+
+
+def _score(op, ignore_elite):
+    if ignore_elite:
+        return 200 + op.get("rarity", 0) * 10
+    return op.get("elite", 0) * 100 + op.get("level", 1) + op.get("rarity", 0) * 10
+
+
+class WorkplaceOptimizer:
+
+    def __init__(self, game_data_path, operators_path, config_path):
+        with open(operators_path, encoding='utf-8') as f:
+            self.operators = [op for op in json.load(f) if op.get("own", True)]
+        with open(config_path, encoding='utf-8') as f:
+            self.config = json.load(f)
+
+    def get_optimal_assignments(self, ignore_elite=False):
+        ranked = sorted(self.operators, key=lambda op: (-_score(op, ignore_elite), op["id"]))
+        requirements = self.config["product_requirements"]
+        slots = [("trading", p, 3) for p, n in requirements["trading_stations"].items() for _ in range(n)]
+        slots += [("manufacture", p, 3) for p, n in requirements["manufacturing_stations"].items() for _ in range(n)]
+        n_power = 9 - self.config["trading_stations_count"] - self.config["manufacturing_stations_count"]
+        slots += [("power", None, 1)] * n_power
+        rooms = {"trading": [], "manufacture": [], "power": []}
+        total = 0.0
+        i = 0
+        for room, product, size in slots:
+            members = ranked[i:i + size]
+            i += size
+            entry = {"operators": [op["name"] for op in members]}
+            if product is not None:
+                entry["product"] = product
+            rooms[room].append(entry)
+            total += sum(_score(op, ignore_elite) for op in members) / 100
+        shift = {
+            "name": "班次1",
+            "Fiammetta": {"enable": self.config["Fiammetta"]["enable"],
+                          "target": ranked[0]["name"] if ranked else "", "order": "pre"},
+            "drones": {"enable": self.config["drones"]["enable"], "room": "trading", "index": 1, "order": "pre"},
+            "rooms": rooms,
+        }
+        return {"title": "stub", "plans": [shift], "raw_results": [_Result(total)]}
+
+    def calculate_upgrade_requirements(self, curr, pot):
+        return [pot["raw_results"][0].total_efficiency - curr["raw_results"][0].total_efficiency]
+
+    def get_suggestions_text(self, upgrades):
+        return "\n".join(f"{gain:.2f}" for gain in upgrades)
+
+
+logic = types.ModuleType("logic")
+logic.VERSION = "test"
+logic.WorkplaceOptimizer = WorkplaceOptimizer
+sys.modules["logic"] = logic
@@ -0,0 +1,120 @@
+import http.client
+import json
+
+import pytest
+
+import api
+from bench import make_roster
+from cache import ResultCache
+from jobs import JobManager
+from layouts import preset_config
+
+
+@pytest.fixture
+def server():
+    srv = api.start_api_server(0, manager=JobManager(cache=ResultCache()))
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def make_client(server):
+    return api.Client(port=server.server_address[1], timeout=30)
+
+
+def test_schedule_then_poll_on_same_connection(server):
+    client = make_client(server)
+    status, body = client.schedule(make_roster(40), preset_config("2-4-3"), wait=30)
+    assert status == 200
+    assert body["state"] == "done"
+    assert body["curr"]["plans"] and body["pot"]["plans"]
+    assert body["total_efficiency"] > 0
+    assert body["suggestions"]
+
+    status, job = client.job(body["job_id"])
+    assert status == 200
+    assert job["key"] == body["key"]
+    client.close()
+
+
+def test_repeated_request_hits_cache(server):
+    roster, config = make_roster(40, seed=1), preset_config("3-3-3")
+    first = make_client(server).schedule(roster, config, wait=30)[1]
+    second = make_client(server).schedule(roster, config, wait=30)[1]
+    assert first["key"] == second["key"]
+    assert second["cached"]
+
+
+@pytest.mark.parametrize("config", [
+    {"foo": 1},
+    dict(preset_config("2-4-3"), trading_stations_count=3),
+    dict(preset_config("2-4-3"), product_requirements={"trading_stations": {"LMD": 2},
+                                                        "manufacturing_stations": {"Pure Gold": -4}}),
+    dict(preset_config("2-4-3"), trading_stations_count="2"),
+])
+def test_invalid_config_is_rejected_without_a_job(server, config):
+    status, body = make_client(server).schedule(make_roster(10), config)
+    assert status == 400
+    assert "error" in body
+    assert server.manager.stats()["queued"] == server.manager.stats()["running"] == 0
+    assert server.manager.get(body.get("job_id")) is None
+
+
+def test_invalid_operators_are_rejected(server):
+    status, body = make_client(server).schedule([], preset_config("2-4-3"))
+    assert status == 400
+
+
+def post_raw(server, body):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=30)
+    conn.request("POST", "/schedule", body=body.encode('utf-8'), headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    status, data = response.status, json.loads(response.read().decode('utf-8'))
+    conn.close()
+    return status, data
+
+
+@pytest.mark.parametrize("field, value", [
+    ("restarts", "Infinity"), ("restarts", "1e400"), ("restarts", "NaN"), ("restarts", "1" + "0" * 400),
+    ("wait", "Infinity"), ("wait", "-Infinity"), ("wait", "1e400"), ("wait", '"soon"'),
+])
+def test_non_finite_restarts_and_wait_are_rejected(server, field, value):
+    request = json.dumps({"operators": make_roster(10), "config": preset_config("2-4-3")})
+    status, body = post_raw(server, request[:-1] + f', "{field}": {value}}}')
+    assert status == 400
+    assert "error" in body
+    assert server.manager.stats()["queued"] == server.manager.stats()["running"] == 0
+
+
+def test_restarts_and_wait_are_clamped(server, monkeypatch):
+    submitted = []
+    submit = server.manager.submit
+
+    def record(*args, **kwargs):
+        submitted.append(kwargs["restarts"])
+        return submit(*args, **kwargs)
+
+    monkeypatch.setattr(server.manager, "submit", record)
+    client = make_client(server)
+    status, body = client.schedule(make_roster(40), preset_config("2-4-3"), restarts=2000000, wait=1e300)
+    assert status == 200 and body["state"] == "done"
+    status, _ = client.schedule(make_roster(40), preset_config("3-3-3"), restarts=-5, wait=-1)
+    assert status in (200, 202)
+    assert submitted == [api.MAX_RESTARTS, 1]
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_invalid_content_length_is_rejected(server, length):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.putrequest("POST", "/schedule")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == 400
+    assert "error" in json.loads(response.read().decode('utf-8'))
+    conn.close()
+
+
+def test_unknown_path(server):
+    status, _ = make_client(server).request("GET", "/nope")
+    assert status == 404
@@ -0,0 +1,122 @@
+import pipeline
+from cache import ResultCache
+from layouts import preset_config
+from pipeline import plan_operators, run_pipeline
+from roster import Roster
+from store import ResultStore, StoredResult
+
+
+def make_operators(extra_elite=0, extra_level=1):
+    # 2-4-3 共 21 个位置：25 名六星填满全部位置 (最后 4 名落选)，三星 X 练度最低、不在任何方案中
+    operators = [{"id": f"char_{i:03d}", "name": f"op{i:03d}", "elite": 0, "level": 50,
+                  "own": True, "potential": 1, "rarity": 6} for i in range(25)]
+    operators.append({"id": "char_900", "name": "X", "elite": extra_elite, "level": extra_level,
+                      "own": True, "potential": 1, "rarity": 3})
+    return operators
+
+
+def first_run(cache):
+    roster, config = Roster.from_list(make_operators()), preset_config("2-4-3")
+    result = run_pipeline(roster, config, cache=cache)
+    assert "X" not in plan_operators(result["curr"]) | plan_operators(result["pot"])
+    previous = {"roster": roster, "config": config, "restarts": 1,
+                "curr": result["curr"], "pot": result["pot"], "txt": result["txt"]}
+    return config, previous
+
+
+def test_promoting_unused_operator_is_recomputed():
+    cache = ResultCache()
+    config, previous = first_run(cache)
+    result = run_pipeline(Roster.from_list(make_operators(extra_elite=1)), config, cache=cache, previous=previous)
+    assert result["counters"]["reused"] == 0
+    assert "X" in plan_operators(result["curr"])
+
+
+def test_level_increase_is_recomputed():
+    cache = ResultCache()
+    config, previous = first_run(cache)
+    result = run_pipeline(Roster.from_list(make_operators(extra_level=30)), config, cache=cache, previous=previous)
+    assert result["counters"]["reused"] == 0
+
+
+def test_removing_unused_operators_reuses_without_caching(tmp_path):
+    cache = ResultCache()
+    config, previous = first_run(cache)
+    operators = [op for op in make_operators() if op["name"] != "X"]
+    operators[-1]["level"] = 40  # 落选的六星降级
+    store = ResultStore(str(tmp_path / "results.db"))
+    entries = len(cache)
+
+    result = run_pipeline(Roster.from_list(operators), config, cache=cache, store=store, previous=previous)
+    assert result["counters"]["reused"] == 1
+    assert result["curr"] is previous["curr"]
+    assert len(cache) == entries
+    assert len(store) == 0
+
+    # 沿用的方案不会被后续没有 previous 的请求当作该干员表的结果
+    fresh = run_pipeline(Roster.from_list(operators), config, cache=cache)
+    assert fresh["counters"]["reused"] == 0
+    assert fresh["key"] != result["key"]
+
+
+def test_store_hit_does_not_cache_placeholder_plans(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    roster, config = Roster.from_list(make_operators()), preset_config("2-4-3")
+    run_pipeline(roster, config, cache=ResultCache(), store=store)
+
+    cache = ResultCache()
+    restored = run_pipeline(roster, config, cache=cache, store=store)
+    assert restored["counters"]["store_hits"] == 1
+    assert isinstance(restored["curr"]["raw_results"][0], StoredResult)
+
+    # 同一干员表、只关闭无人机：不能命中恢复出的占位方案，需重新搜索得到真实结果
+    result = run_pipeline(roster, dict(config, drones={"enable": False}), cache=cache, store=store)
+    assert result["counters"]["store_hits"] == 0
+    assert result["counters"]["searches"] == 2
+    assert not isinstance(result["curr"]["raw_results"][0], StoredResult)
+    assert not isinstance(result["pot"]["raw_results"][0], StoredResult)
+
+
+def test_serial_run_builds_one_optimizer(monkeypatch):
+    # 不使用进程池时，串行搜索与提升分析共用同一个优化器
+    built = []
+    build = pipeline.build_optimizer
+
+    def counting(*args, **kwargs):
+        built.append(args)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "build_optimizer", counting)
+    result = run_pipeline(Roster.from_list(make_operators()), preset_config("2-4-3"), cache=ResultCache())
+    assert result["txt"] is not None
+    assert len(built) == 1
+
+
+def test_worker_optimizers_are_not_shared_between_flags(monkeypatch):
+    # 工作进程内缓存的优化器只以同一个 ignore_elite 重复调用
+    calls = {}
+    get = pipeline.build_optimizer
+
+    def recording(*args, **kwargs):
+        optimizer = get(*args, **kwargs)
+        search = optimizer.get_optimal_assignments
+
+        def tracked(ignore_elite=False):
+            calls.setdefault(id(optimizer), set()).add(ignore_elite)
+            return search(ignore_elite=ignore_elite)
+
+        optimizer.get_optimal_assignments = tracked
+        return optimizer
+
+    monkeypatch.setattr(pipeline, "build_optimizer", recording)
+    monkeypatch.setattr(pipeline, "_worker_optimizers", pipeline.OrderedDict())
+    operators, config = make_operators(), preset_config("2-4-3")
+    game_data = pipeline.get_game_data()
+    for seed, flag in [(0, True), (0, False), (1, True), (1, False)]:
+        pipeline._search_worker(operators, config, flag, game_data, seed)
+    assert len(pipeline._worker_optimizers) == 2
+    assert sorted(calls.values(), key=sorted) == [{False}, {True}]
+
+    calls.clear()
+    pipeline.search_restarts(operators, config, (False, True), restarts=3, game_data=game_data)
+    assert sorted(calls.values(), key=sorted) == [{False}, {True}]
@@ -0,0 +1,32 @@
+from cache import ResultCache
+from layouts import preset_config
+from pipeline import run_pipeline
+from roster import Roster
+from test_pipeline import make_operators
+from whatif import rank_promotions, what_if
+
+
+def test_what_if_keeps_shared_cache_read_only():
+    roster, config = Roster.from_list(make_operators()), preset_config("2-4-3")
+    cache, scan_cache = ResultCache(), ResultCache()
+    run_pipeline(roster, config, cache=cache)
+    entries = len(cache)
+
+    result = what_if(roster, {"char_900": 1}, config, cache=cache, scan_cache=scan_cache)
+    assert result["delta"] > 0
+    assert result["cost"] == 10000
+    assert result["changed_rooms"]
+    assert len(cache) == entries
+    assert len(scan_cache) == 1
+
+    # 再次模拟命中摘要，不再搜索
+    assert what_if(roster, {"char_900": 1}, config, cache=cache, scan_cache=scan_cache) == result
+
+
+def test_rank_promotions_without_cached_base():
+    roster, config = Roster.from_list(make_operators()), preset_config("2-4-3")
+    cache, scan_cache = ResultCache(), ResultCache()
+    ranking = rank_promotions(roster, config, cache=cache, scan_cache=scan_cache)
+    assert ranking["evaluated"] == ranking["total"] == len(roster)
+    assert ranking["rows"][0]["name"] == "X"
+    assert len(cache) == 0
@@ -0,0 +1,190 @@
+import time
+
+from cache import canonical_hash
+from gamedata import get_game_data
+from pipeline import first_efficiency, iter_searches, plan_key, plan_operators, split_config
+from roster import Operator, Roster
+
+# ==========================================
+# 练度模拟 (What-if)
+# ==========================================
+# 「如果精英化这名干员会怎样」：在当前方案的基础上修改少数干员的精英化阶段，
+# 重新计算当前练度方案并给出总效率变化与受影响的房间；
+# 也可以一次性评估全部单干员精英化，按每万龙门币带来的效率提升排序。
+# 所有搜索都经 iter_searches 提交到共享搜索进程池，不在任务线程内执行；
+# 共享方案缓存只读，模拟得到的方案只以 (总效率, 首班房间分配) 摘要写入独立的 scan_cache。
+
+# 各星级可达到的最高精英化阶段
+MAX_ELITE = {1: 0, 2: 0, 3: 1, 4: 2, 5: 2, 6: 2}
+
+# 精英化所需龙门币：(星级, 目标阶段) -> 费用
+PROMOTION_COST = {
+    (3, 1): 10000,
+    (4, 1): 15000, (4, 2): 60000,
+    (5, 1): 20000, (5, 2): 120000,
+    (6, 1): 30000, (6, 2): 180000,
+}
+
+
+def max_elite(op):
+    # 星级未知 (旧版导出没有 rarity) 时按可精二处理
+    return MAX_ELITE.get(op.rarity, 2)
+
+
+def promotion_cost(op, target):
+    return sum(PROMOTION_COST.get((op.rarity, e), 0) for e in range(op.elite + 1, target + 1))
+
+
+def cap_changes(roster, changes):
+    # 目标阶段不超过星级上限；只保留确实会提升的干员
+    capped = {}
+    for op in roster.candidates():
+        if op.id in changes:
+            target = min(changes[op.id], max_elite(op))
+            if target > op.elite:
+                capped[op.id] = target
+    return capped
+
+
+def promote(roster, changes):
+    # changes: {干员 id: 目标精英化阶段}；超过星级上限时按上限处理，精英化后等级从 1 级开始
+    operators = []
+    for op in roster:
+        target = changes.get(op.id)
+        if target is not None:
+            target = min(target, max_elite(op))
+        if target is not None and target > op.elite:
+            op = Operator(op.id, op.name, target, 1, op.own, op.potential, op.rarity)
+        operators.append(op)
+    return Roster(operators)
+
+
+def room_assignments(plan):
+    # 首个班次的房间分配：{(房间类型, 序号): 干员元组}
+    shifts = plan.get("plans") or []
+    if not shifts:
+        return {}
+    rooms = {}
+    for room, entries in (shifts[0].get("rooms") or {}).items():
+        for index, entry in enumerate(entries or []):
+            rooms[(room, index + 1)] = tuple(entry.get("operators") or [])
+    return rooms
+
+
+def _diff_rooms(old, new):
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+
+def iter_summaries(rosters, config, game_data, cache=None, scan_cache=None, deadline=None):
+    # rosters: {tag: Roster}，按完成顺序产出 (tag, (总效率, 首班房间分配))，均为当前练度方案。
+    # 共享方案缓存 (cache，与 run_pipeline 共用键) 只读；未命中的方案经 iter_searches 在搜索进程池中计算，
+    # 摘要写入 scan_cache (键与全布局扫描的纯数值条目区分开)。搜索失败或到达 deadline 的条目不产出
+    search_config = split_config(config)[0]
+    pending = {}
+    for tag, roster in rosters.items():
+        candidates = roster.candidates()
+        key = plan_key(candidates.digest, search_config, False, game_data)
+        entry = cache.get(key) if cache is not None else None
+        summary = scan_cache.get(canonical_hash(key, "rooms")) if entry is None and scan_cache is not None else None
+        if entry is not None:
+            yield tag, (first_efficiency(entry[0]), room_assignments(entry[0]))
+        elif summary is not None:
+            yield tag, summary
+        elif key in pending:
+            pending[key][0].append(tag)  # 干员表相同 (例如没有实际提升) 时只搜索一次
+        else:
+            pending[key] = ([tag], candidates.to_list())
+
+    tasks = [((tags, key), operators, config) for key, (tags, operators) in pending.items()]
+    for (tags, key), plan in iter_searches(tasks, game_data, deadline):
+        if plan is None:
+            continue
+        summary = (first_efficiency(plan), room_assignments(plan))
+        if scan_cache is not None:
+            scan_cache.put(canonical_hash(key, "rooms"), summary)
+        for tag in tags:
+            yield tag, summary
+
+
+def what_if(roster, changes, config, game_data=None, cache=None, scan_cache=None):
+    # 单次模拟：返回新总效率、变化量与受影响的房间 (基准与模拟方案在进程池中并行计算)
+    game_data = game_data or get_game_data()
+    changes = cap_changes(roster, changes)
+    summaries = dict(iter_summaries({"base": roster, "after": promote(roster, changes)}, config, game_data,
+                                    cache, scan_cache))
+    if len(summaries) < 2:
+        raise RuntimeError("当前练度方案计算失败")
+    (base_eff, base_rooms), (eff, rooms) = summaries["base"], summaries["after"]
+    return {
+        "base_efficiency": base_eff,
+        "total_efficiency": eff,
+        "delta": eff - base_eff,
+        "changed_rooms": _diff_rooms(base_rooms, rooms),
+        "cost": sum(promotion_cost(op, changes[op.id]) for op in roster.candidates() if op.id in changes),
+    }
+
+
+def promotion_candidates(roster, relevant_names=None):
+    # 可精英化的已拥有干员；给定 relevant_names (例如理论极限方案中出现的干员) 时只保留这些
+    result = []
+    for op in roster.candidates():
+        if op.elite >= max_elite(op):
+            continue
+        if relevant_names is not None and op.name not in relevant_names:
+            continue
+        result.append(op)
+    return result
+
+
+def _cached_pot_names(roster, config, game_data, cache):
+    # 理论极限方案 (忽略精英化限制) 中出现的干员；未缓存时返回 None 表示不过滤
+    if cache is None:
+        return None
+    key = plan_key(roster.candidates().digest, split_config(config)[0], True, game_data)
+    entry = cache.get(key)
+    return plan_operators(entry[0]) if entry is not None else None
+
+
+def rank_promotions(roster, config, game_data=None, cache=None, relevant_names="auto", budget=None, progress=None,
+                    scan_cache=None):
+    # 批量评估所有单干员精英化 (升至下一阶段)，按每万龙门币的效率提升排序。
+    # 默认只评估理论极限方案中出现过的干员：其他干员即使精英化也难以进入任何房间。
+    # 共享方案缓存 (cache) 只读；各模拟方案只以 (总效率, 首班房间分配) 写入独立的 scan_cache
+    started = time.perf_counter()
+    deadline = started + budget if budget else None
+    game_data = game_data or get_game_data()
+    if relevant_names == "auto":
+        relevant_names = _cached_pot_names(roster, config, game_data, cache)
+
+    # 基准方案不受时间预算限制，先于各模拟方案完成
+    base = dict(iter_summaries({"base": roster}, config, game_data, cache, scan_cache)).get("base")
+    if base is None:
+        raise RuntimeError("当前练度方案计算失败")
+    base_eff, base_rooms = base
+    ops = promotion_candidates(roster, relevant_names)
+
+    rows = []
+
+    def add_row(op, target, eff, rooms):
+        cost = promotion_cost(op, target)
+        rows.append({
+            "id": op.id, "name": op.name, "from": op.elite, "to": target,
+            "total_efficiency": eff, "delta": eff - base_eff, "cost": cost,
+            "gain_per_10k": (eff - base_eff) / (cost / 10000) if cost else 0.0,
+            "changed_rooms": _diff_rooms(base_rooms, rooms),
+        })
+        if progress is not None:
+            progress("promote", f"🧪 已评估 {len(rows)}/{len(ops)} 名干员", int(100 * len(rows) / max(1, len(ops))))
+
+    variants = {(op, op.elite + 1): promote(roster, {op.id: op.elite + 1}) for op in ops}
+    for (op, target), (eff, rooms) in iter_summaries(variants, config, game_data, cache, scan_cache, deadline):
+        add_row(op, target, eff, rooms)
+
+    rows.sort(key=lambda r: (r["gain_per_10k"], r["delta"]), reverse=True)
+    return {
+        "rows": rows,
+        "base_efficiency": base_eff,
+        "evaluated": len(rows),
+        "total": len(ops),
+        "elapsed": time.perf_counter() - started,
+    }